@@ -0,0 +1,104 @@
+import numpy as np
+from scipy.signal import lfilter
+
+
+def wilder_smooth(x, alpha, value=None, old_wt=None):
+    """
+    x.ewm(alpha=alpha, adjust=False).mean() along the last axis, with
+    pandas' NaN rules (ignore_na=False). The rows of a 2-D x are smoothed
+    together in ONE lfilter call; NaN gaps fall back to the bar-by-bar
+    recursion (same as streaming_indicators.WilderEMA).
+    value / old_wt continue from an earlier call (NaN / 1 = fresh start).
+    Returns (smoothed, value, old_wt).
+    """
+    x = np.asarray(x, dtype=np.float64)
+    rows = np.atleast_2d(x)
+    k, n = rows.shape
+    value = np.full(k, np.nan) if value is None else np.array(value, dtype=np.float64).reshape(k)
+    old_wt = np.ones(k) if old_wt is None else np.array(old_wt, dtype=np.float64).reshape(k)
+    out = np.full(rows.shape, np.nan)
+
+    # A row without a value yet starts at its first observation
+    observed = ~np.isnan(rows)
+    first = np.where(observed.any(axis=1), observed.argmax(axis=1), n)
+    start = np.where(np.isnan(value), first, 0)
+
+    s = start[0]
+    if (start == s).all() and (old_wt == 1.0).all() and observed[:, s:].all():
+        # No gaps: y[i] = alpha * x[i] + (1 - alpha) * y[i-1], a first-order IIR filter
+        if s < n:
+            init = np.where(np.isnan(value), rows[:, s], value)
+            out[:, s:] = lfilter([alpha], [1.0, alpha - 1.0], rows[:, s:], axis=-1,
+                                 zi=((1 - alpha) * init)[:, None])[0]
+            value = out[:, -1].copy()
+    else:
+        for r in range(k):
+            v, w = value[r], old_wt[r]
+            for i, xi in enumerate(rows[r].tolist()):
+                if v == v: # not NaN
+                    w *= 1 - alpha
+                    if xi == xi:
+                        v = (w * v + alpha * xi) / (w + alpha)
+                        w = 1.0
+                elif xi == xi:
+                    v = xi
+                out[r, i] = v
+            value[r], old_wt[r] = v, w
+    return out.reshape(x.shape), value, old_wt
+
+
+def true_range(high, low, close, prev_close=np.nan):
+    """TR per bar: the largest of high-low and the gaps to the previous close (prev_close = the bar before high[0])."""
+    prev_close = np.concatenate(([prev_close], close[:-1]))
+    return np.fmax(np.abs(high - low), np.fmax(np.abs(high - prev_close), np.abs(low - prev_close)))
+
+
+def directional_movement(high, low, prev_high=np.nan, prev_low=np.nan):
+    """(+DM, -DM) per bar: the bigger of the up and down move, the other one is 0."""
+    up_move = high - np.concatenate(([prev_high], high[:-1]))
+    down_move = np.concatenate(([prev_low], low[:-1])) - low
+    with np.errstate(invalid='ignore'):
+        pdm = np.where(up_move > down_move, np.maximum(up_move, 0.0), 0.0)
+        ndm = np.where(down_move > up_move, np.maximum(down_move, 0.0), 0.0)
+    return pdm, ndm
+
+
+def smooth_adx(tr, pdm, ndm, window=14, dm_state=(None, None), adx_state=(None, None)):
+    """
+    The Wilder half of the ADX: TR, +DM and -DM smoothed together in one
+    lfilter pass, then DI+ / DI-, DX and the DX smoothing.
+    Returns (adx, dm_state, adx_state).
+    """
+    alpha = 1 / window
+    (tr_s, pdm_s, ndm_s), dm_value, dm_wt = wilder_smooth(np.vstack([tr, pdm, ndm]), alpha, *dm_state)
+
+    # x/0 -> inf, 0/0 -> NaN, like pandas
+    with np.errstate(divide='ignore', invalid='ignore'):
+        pdi = 100 * (pdm_s / tr_s)
+        ndi = 100 * (ndm_s / tr_s)
+        dx = 100 * (np.abs(pdi - ndi) / (pdi + ndi))
+    adx_values, adx_value, adx_wt = wilder_smooth(dx, alpha, *adx_state)
+    return adx_values, (dm_value, dm_wt), (adx_value, adx_wt)
+
+
+def adx(high, low, close, window=14, state=None):
+    """
+    The ADX straight from NumPy arrays: TR, +DM and -DM vectorized, then
+    smoothed together in one Wilder pass. Same numbers as the pandas
+    strategy.calculate_adx_pandas (up to float rounding).
+    Pass the returned state to the next call to continue the series chunk
+    by chunk (the streaming form; StreamingADX is the per-candle one).
+    Returns (adx, state).
+    """
+    high, low, close = (np.asarray(a, dtype=np.float64) for a in (high, low, close))
+    if len(close) == 0:
+        return np.empty(0), state
+    state = state or {'prev': (np.nan, np.nan, np.nan), 'dm': (None, None), 'adx': (None, None)}
+    prev_high, prev_low, prev_close = state['prev']
+
+    tr = true_range(high, low, close, prev_close)
+    pdm, ndm = directional_movement(high, low, prev_high, prev_low)
+    adx_values, dm_state, adx_state = smooth_adx(tr, pdm, ndm, window, state['dm'], state['adx'])
+
+    state = {'prev': (high[-1], low[-1], close[-1]), 'dm': dm_state, 'adx': adx_state}
+    return adx_values, state
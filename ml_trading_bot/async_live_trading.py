@@ -0,0 +1,281 @@
+import asyncio
+import logging
+import time
+from datetime import datetime, timedelta
+
+import ccxt.async_support as ccxt_async
+import pandas as pd
+
+from bar_store import BarStore
+from config import SYMBOL, TIMEFRAME, API_KEY, SECRET_KEY, RETRAIN_EVERY, DRIFT_THRESHOLD, ONLINE_LEARNING
+from data_loader import get_fetch_start, closed_candles
+from live_trading import get_base_currency, get_quote_currency, rm
+from model_manager import ModelManager
+from model_store import ModelStore
+from training_worker import TrainingWorker
+from instrumentation import metrics
+from strategy import training_rows, signal_from_model, min_rows
+from streaming_indicators import FeatureWindow
+from trading_state import PositionState
+
+CANDLE_CLOSE_BUFFER = 2      # seconds after the close before we ask for the new candle
+ORDER_POLL_INTERVAL = 0.25   # seconds between fetch_order calls
+ORDER_TIMEOUT = 15           # give up waiting for a fill after this many seconds
+FINAL_ORDER_STATES = ('closed', 'canceled', 'cancelled', 'rejected', 'expired')
+
+
+def get_async_exchange():
+    """Same Alpaca setup as data_loader.get_exchange, but on ccxt's asyncio client."""
+    exchange = ccxt_async.alpaca({
+        'apiKey': API_KEY,
+        'secret': SECRET_KEY,
+    })
+    if API_KEY.startswith('PK'):
+        exchange.urls['api'] = {
+            'trader': 'https://paper-api.alpaca.markets',
+            'market': 'https://data.alpaca.markets'
+        }
+    else:
+        exchange.urls['api'] = {
+            'trader': 'https://api.alpaca.markets',
+            'market': 'https://data.alpaca.markets'
+        }
+    return exchange
+
+
+@metrics.timed("data_fetch")
+async def fetch_latest_bars(exchange, symbol, timeframe, store):
+    """
+    Async version of data_loader.update_store: fetches only the candles
+    newer than the local store and appends the closed ones.
+    Returns how many were added.
+    """
+    now_ms = exchange.milliseconds()
+    since = get_fetch_start(store, symbol, timeframe, now_ms)
+    timeframe_ms = exchange.parse_timeframe(timeframe) * 1000
+
+    all_ohlcv = []
+    while True:
+        batch = await exchange.fetch_ohlcv(symbol, timeframe, since=since, limit=1000)
+        if not batch:
+            break
+        all_ohlcv.extend(batch)
+        # Stop when the timestamp didn't advance or a short batch says we caught up
+        if batch[-1][0] == since or len(batch) < 1000:
+            break
+        since = batch[-1][0] + 1
+
+    return store.append(symbol, timeframe, closed_candles(all_ohlcv, timeframe_ms, now_ms))
+
+
+async def wait_for_fill(exchange, order, symbol, timeout=ORDER_TIMEOUT):
+    """Polls the order status instead of sleeping a fixed 2 seconds."""
+    deadline = time.monotonic() + timeout
+    while order.get('status') not in FINAL_ORDER_STATES:
+        if time.monotonic() > deadline:
+            logging.warning(f"⚠️ Order {order['id']} still {order.get('status')} after {timeout}s")
+            break
+        await asyncio.sleep(ORDER_POLL_INTERVAL)
+        order = await exchange.fetch_order(order['id'], symbol)
+    return order
+
+
+@metrics.timed("order_submission")
+async def execute_trade_async(exchange, signal, symbol, balance, ticker):
+    """
+    Async version of live_trading.execute_ccxt_trade.
+    balance / ticker are fetched by the caller (concurrently with the candles),
+    so the only calls left here are the orders themselves.
+    """
+    base = get_base_currency(symbol)
+    quote = get_quote_currency(symbol)
+
+    usd_free = balance[quote]['free']
+    crypto_free = balance[base]['free']
+    print(f"💰 Balance: {usd_free:.2f} {quote} | {crypto_free:.6f} {base}")
+
+    # 1. SELL LOGIC (Exit to Cash)
+    if crypto_free > 0.0001: # Threshold to avoid dust errors
+        try:
+            print(f"📉 Selling all {base}...")
+            order = await exchange.create_market_sell_order(symbol, crypto_free)
+            order = await wait_for_fill(exchange, order, symbol)
+            print(f"✅ Sell Order {order.get('status')}")
+            # The proceeds are the cost minus the fee; when the order doesn't
+            # report a quote-currency fee, ask the exchange for the balance
+            fee = order.get('fee') or {}
+            if order.get('cost') and fee.get('cost') is not None and fee.get('currency') == quote:
+                usd_free += order['cost'] - fee['cost']
+            else:
+                usd_free = (await exchange.fetch_balance())[quote]['free']
+        except Exception as e:
+            print(f"❌ Sell Error: {e}")
+
+    # 2. BUY LOGIC (Enter Long)
+    if signal == "BUY":
+        try:
+            if usd_free > 10.0: # Minimum 10 USD to trade
+                current_price = ticker['last']
+                amount_to_buy = (usd_free * 0.95) / current_price
+
+                print(f"🚀 Buying {amount_to_buy:.6f} {base} at ~${current_price:.2f}...")
+                order = await exchange.create_market_buy_order(symbol, amount_to_buy)
+                order = await wait_for_fill(exchange, order, symbol)
+                print(f"✅ Buy Order {order.get('status')}")
+            else:
+                print("⚠️ Not enough cash to buy.")
+        except Exception as e:
+            print(f"❌ Buy Error: {e}")
+
+
+def get_coin_value(balance, ticker, base):
+    """The base-currency holdings at the last price (no cash)."""
+    return balance.get('total', {}).get(base, 0) * ticker['last']
+
+
+def get_equity(balance, ticker, base, quote):
+    return balance.get('total', {}).get(quote, 0) + get_coin_value(balance, ticker, base)
+
+
+async def sleep_until_candle_close():
+    now = datetime.now()
+    next_hour = (now + timedelta(hours=1)).replace(minute=0, second=0, microsecond=0)
+    wait_seconds = (next_hour - now).total_seconds() + CANDLE_CLOSE_BUFFER
+    print(f"⏳ Waiting {int(wait_seconds // 60)}m {int(wait_seconds % 60)}s for candle close...")
+    await asyncio.sleep(wait_seconds)
+
+
+async def run_live_bot_async(active_features, symbol=SYMBOL, timeframe=TIMEFRAME, exchange=None, store=None,
+                             wait_for_candle=sleep_until_candle_close, max_cycles=None, model_store=None):
+    """
+    asyncio version of live_trading.run_live_bot.
+    After each candle close, candles + balance + ticker are fetched
+    CONCURRENTLY, and orders are confirmed by polling their status.
+    Pass a MockExchange (and a wait_for_candle that calls its advance())
+    to run it offline. A wait_for_candle that returns the closed candle
+    (stream_ingest.BarStream.wait_for_bar) skips the REST candle fetch.
+    """
+    logging.info("🤖 Starting async ML Trading Bot...")
+    exchange = exchange or get_async_exchange()
+    store = store or BarStore()
+    model_store = model_store or ModelStore()
+    base = get_base_currency(symbol)
+    quote = get_quote_currency(symbol)
+    worker = None
+
+    try:
+        # Verify Connection
+        try:
+            balance, ticker = await asyncio.gather(exchange.fetch_balance(), exchange.fetch_ticker(symbol))
+            logging.info(f"connected. Balance: ${balance['free'][quote]:.2f}")
+        except Exception as e:
+            logging.error(f"Auth Error: Check .env keys. {e}")
+            return
+        # The circuit breaker watches total equity (cash + coins at the last price),
+        # we already have the ticker so this costs no extra call
+        rm.set_daily_baseline(get_equity(balance, ticker, base, quote))
+
+        feature_window = FeatureWindow(maxlen=300)
+        # Warm start from the last saved model artifact (no fit before the first decision)
+        model_manager = ModelManager(retrain_every=RETRAIN_EVERY, drift_threshold=DRIFT_THRESHOLD, online=ONLINE_LEARNING)
+        model_manager = model_store.load_latest(symbol, timeframe, active_features, feature_window.rows.maxlen,
+                                                params=model_manager.params()) or model_manager
+        # Training runs in a background thread between candles; the candle close only predicts
+        worker = TrainingWorker(model_manager, model_store, store_key=(symbol, timeframe, feature_window.rows.maxlen))
+
+        state = PositionState("BUY" if balance.get('total', {}).get(base, 0) > 0.0001 else "HOLD", "HOLD", confirmations=3)
+
+        timeframe_ms = exchange.parse_timeframe(timeframe) * 1000
+        cycle = 0
+        while max_cycles is None or cycle < max_cycles:
+            cycle += 1
+            try:
+                candle = await wait_for_candle()
+                candle_close = time.perf_counter()
+
+                # 1. FETCH EVERYTHING AT ONCE (a streamed candle is already here, then
+                # the candles are only fetched to warm up the first cycle, or to fill a gap
+                # when the stream skipped a candle / a cycle died after taking one)
+                last_ts = feature_window.rows.last_ts
+                fetch_bars = candle is None or last_ts is None or candle[0] != last_ts + timeframe_ms
+                if candle is not None and last_ts is not None and fetch_bars:
+                    logging.warning(f"⚠️ Streamed candle {pd.to_datetime(candle[0], unit='ms')} doesn't follow "
+                                    f"{pd.to_datetime(last_ts, unit='ms')}, refetching over REST")
+                fetches = [exchange.fetch_balance(), exchange.fetch_ticker(symbol)]
+                if fetch_bars:
+                    fetches.append(fetch_latest_bars(exchange, symbol, timeframe, store))
+                balance, ticker, *_ = await asyncio.gather(*fetches)
+
+                if rm.check_circuit_breaker(get_equity(balance, ticker, base, quote)):
+                    logging.critical(" CIRCUIT BREAKER TRIGGERED! Max daily loss exceeded. Halting.")
+                    break
+
+                # 2. GET SIGNAL (predict only, with the newest background-trained model)
+                if fetch_bars:
+                    feature_window.update_from_store(store, symbol, timeframe)
+                    # REST may not have the streamed candle yet; it is next in line now
+                    last_ts = feature_window.rows.last_ts
+                    if candle is not None and (last_ts is None or candle[0] == last_ts + timeframe_ms):
+                        store.append(symbol, timeframe, [candle])
+                        feature_window.update(*candle)
+                else:
+                    store.append(symbol, timeframe, [candle])
+                    feature_window.update(*candle)
+                frame = feature_window.to_frame() if len(feature_window.rows) >= min_rows(active_features) else None
+                rows = training_rows(frame, active_features) if frame is not None else None
+                trained_now = False
+                if rows is None:
+                    raw_signal = "HOLD"
+                else:
+                    if not worker.ready():
+                        # Nothing to warm-start from: the very first model is fit right here (in a thread)
+                        await asyncio.to_thread(worker.train_now, *rows, active_features)
+                        trained_now = True
+                    raw_signal = signal_from_model(frame, active_features, worker.model_manager)
+                print(f"🔮 Raw Signal: {raw_signal}")
+
+                # 3. BUFFER LOGIC (n-Signal Confirmation)
+                current_position = state.position
+                switched = state.update(raw_signal)
+
+                # 4. EXECUTE
+                if switched:
+                    print(f"⚡ SWITCHING: {current_position} -> {state.position}")
+                    await execute_trade_async(exchange, state.position, symbol, balance, ticker)
+                else:
+                    print("💤 No trade required.")
+
+                logging.info(f"⏱️ Candle close -> decision done in {time.perf_counter() - candle_close:.3f}s")
+                metrics.end_cycle(signal=raw_signal, position=state.position,
+                                  close_to_decision_s=round(time.perf_counter() - candle_close, 6))
+
+                # 5. TRAIN the next model in the background while we wait for the next candle
+                if rows is not None and not trained_now:
+                    worker.submit(*rows, active_features)
+
+            except Exception as e:
+                print(f"⚠️ Loop Error: {e}")
+                await asyncio.sleep(60) # Wait 1 min before retrying
+    finally:
+        if worker is not None:
+            worker.close()
+        await exchange.close()
+
+
+if __name__ == "__main__":
+    # Offline dry run against btc_hourly.csv
+    import pandas as pd
+    import tempfile
+    from mock_exchange import MockExchange
+
+    replay = pd.read_csv("btc_hourly.csv", parse_dates=['ts'])
+    symbol = SYMBOL or "BTC/USD"
+    mock = MockExchange(replay, symbol=symbol)
+
+    async def next_candle():
+        mock.advance()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        asyncio.run(run_live_bot_async(["returns", "rsi", "adx", "dist_from_mean"], symbol=symbol, timeframe=TIMEFRAME or "1h", exchange=mock,
+                                       store=BarStore(tmp_dir), wait_for_candle=next_candle, max_cycles=50,
+                                       model_store=ModelStore(tmp_dir + "/models")))
@@ -1,119 +1,267 @@
 
+import numpy as np
 import pandas as pd
 import matplotlib.pyplot as plt
-from strategy import generate_signal
+from strategy import build_features, predict_prob_up, ADX_THRESHOLD, CONFIDENCE, MA_WINDOW, VOLUME_WINDOW
 from performance_metrics import generate_report
+from model_manager import ModelManager
+from signal_cache import SignalCache
+from instrumentation import metrics
+from config import RETRAIN_EVERY, DRIFT_THRESHOLD, ONLINE_LEARNING, SIGNAL_CACHE_DIR, SIGNAL_CACHE_MAX_MB
+from trading_state import PositionState
 
 #Feature: Slippage & Fees
 FEE_PCT = 0.001       # 0.1% per trade
 SLIPPAGE_PCT = 0.001 # 0.1% slippage
+WINDOW = 50 # rows each bar's model is trained on
 
-def run_backtest(df, initial_balance=10000, active_features = ['returns', 'range', 'rsi', 'volatility','adx','volume_change', 'relative_volume','dist_from_mean']):
-    if df is None or len(df) < 50:
-        print("Error: Not enough data to backtest. Need at least 50 rows.")
-        return None
+# Signal codes used by the array-based core
+HOLD, BUY, SELL = 0, 1, -1
+SKIP = 2 # generate_signal failed on this bar -> leave the confirmation state alone
+SIGNAL_CODES = {"HOLD": HOLD, "BUY": BUY, "SELL": SELL}
+POSITION_NAMES = {HOLD: "HOLD", BUY: "BUY", SELL: "SELL"}
 
-    balance = initial_balance
-    equity_curve = []
-    dates = []
-    
+
+def get_start_idx(n_rows):
     # DYNAMIC START INDEX:
     # We need enough data to train (at least 50 rows), but we can't start 
     # at 100 if we only have 90 rows.
     # We use min(100, len(df) - 10) to ensure we always have a loop.
-    start_idx = max(100, int(len(df) * 0.8)) 
+    start_idx = max(100, int(n_rows * 0.8)) 
     
     # Ensure start_idx is at least 20 to give the ML model *some* history
     if start_idx < 20: start_idx = 20
+    return start_idx
 
-    print(f"Running Realistic Backtest on {len(df)} rows...")
-    print(f"   (Training on first {start_idx} candles, testing on remainder)")
 
-    # Pre-fill equity curve for the training period (flat line)
-    # This aligns the charts so they start at the correct timestamp
-    for i in range(start_idx):
-        equity_curve.append(initial_balance)
-        dates.append(df.iloc[i]['ts'])
-
-    # --- THE MAIN LOOP ---
-    switch_counter= 0
-    hold_counter =0 
-    last_Four_positions= ["HOLD","HOLD","HOLD","HOLD"]
-    current_position= "HOLD"
-    for i in range(start_idx, len(df) - 1):
-        current_window = df.iloc[i-50:i]
-        
+def generate_probabilities(features, start_idx, active_features, model_manager=None):
+    """
+    Stage one of the signal pipeline: one prediction per bar, each
+    trained on the 50 rows before it. Returns three arrays:
+      prob_up - P(up) per bar (NaN = no prediction, which trades as HOLD)
+      adx     - the ADX the rules compare against on that bar
+      skipped - True where the model failed (SKIP)
+    The trading rules are applied afterwards (signals_from_probabilities),
+    so threshold changes never need these to be recomputed.
+    """
+    prob_up = np.full(len(features), np.nan)
+    adx = np.full(len(features), np.nan)
+    skipped = np.zeros(len(features), dtype=bool)
+    for i in range(start_idx, len(features) - 1):
+        current_window = features.iloc[i-WINDOW:i]
+
         # Validation: Check if window is empty
         if len(current_window) < 10:
+            skipped[i] = True
             continue
-            
-        current_price = df.iloc[i]['close']
-        prev_price = df.iloc[i-1]['close']
-        actual_next_price = df.iloc[i+1]['close']
-        timestamp = df.iloc[i+1]['ts']
-        
-        if current_position == "BUY":
-            # Long profit/loss: (Current - Previous) / Previous
-            pct_change = (current_price - prev_price) / prev_price
-            balance += (balance * pct_change)
-            
-        elif current_position == "SELL":
-            # Short profit/loss: (Previous - Current) / Previous
-            pct_change = (prev_price - current_price) / prev_price
-            balance += (balance * pct_change)
-
-        # Get Prediction
-        try:    
-            prediction = generate_signal(current_window,active_features= active_features)
-            if prediction != "HOLD":
-                hold_counter = 0
-                last_Four_positions[3]=last_Four_positions[2]
-                last_Four_positions[2]=last_Four_positions[1]
-                last_Four_positions[1]=last_Four_positions[0]
-                last_Four_positions[0]=prediction
-                if prediction != current_position:
-                    switch_counter +=1 
-                else:
-                    switch_counter =0 
-            else:
-                hold_counter +=1
-                if hold_counter == 4:
-                    switch_counter=0
-                    
-                last_Four_positions[3]=last_Four_positions[2]
-                last_Four_positions[2]=last_Four_positions[1]
-                last_Four_positions[1]=last_Four_positions[0]
+
+        try:
+            prediction = predict_prob_up(current_window, active_features, model_manager=model_manager)
+            if prediction is not None:
+                prob_up[i], adx[i] = prediction
         except Exception as e:
             print(e)
             # If ML fails (e.g., data too small), skip this candle
-            prediction = "HOLD"
-        #print(prediction)
-        # Trading Logic
-        #if last_Four_positions[0] != "HOLD" and last_Four_positions[0] != current_position and last_Four_positions[0]==last_Four_positions[1] and last_Four_positions[1]==last_Four_positions[2] and last_Four_positions[2]==last_Four_positions[3]:
-        if switch_counter==3:
-            balance -= (balance * (FEE_PCT + SLIPPAGE_PCT))
-            print(f"🔄 SWITCH: {current_position} -> {prediction} at ${current_price:.2f}")
-            current_position = prediction
-            switch_counter = 0
-            hold_counter = 0
-        equity_curve.append(balance)
-        dates.append(timestamp)
+            skipped[i] = True
+    return prob_up, adx, skipped
+
+
+def signals_from_probabilities(prob_up, adx, skipped, adx_threshold=ADX_THRESHOLD, confidence=CONFIDENCE, contrarian=True):
+    """
+    Stage two of the signal pipeline: the ADX regime rules of
+    apply_regime_rules, evaluated for every bar at once.
+    contrarian=False turns the ranging-regime flip off (always trust the model).
+    Returns int8 signal codes; re-scoring a whole backtest costs milliseconds.
+    """
+    direction = np.where(prob_up > confidence, BUY, np.where(prob_up < (1 - confidence), SELL, HOLD))
+    if contrarian:
+        # Ranging regime (ADX at or below the threshold): FADE the model direction
+        direction = np.where(adx > adx_threshold, direction, -direction)
+    signals = np.where(np.isnan(prob_up), HOLD, direction).astype(np.int8)
+    signals[skipped] = SKIP
+    return signals
+
+
+def generate_signals(features, start_idx, active_features, model_manager=None, adx_threshold=ADX_THRESHOLD, confidence=CONFIDENCE, contrarian=True):
+    """
+    Walk-forward signal pass: both pipeline stages in one call, each bar
+    trained on the 50 rows before it. Returns an int8 array of signal codes
+    (bars before start_idx and the last bar stay HOLD).
+    """
+    prob_up, adx, skipped = generate_probabilities(features, start_idx, active_features, model_manager)
+    return signals_from_probabilities(prob_up, adx, skipped, adx_threshold, confidence, contrarian)
+
+
+def simulate(close, signals, start_idx, initial_balance=10000, fee_pct=FEE_PCT + SLIPPAGE_PCT, confirmations=3):
+    """
+    The backtest core. Runs over plain arrays of close prices and signal codes,
+    with the n-signal confirmation state in a PositionState (same one the live bots use).
+    Returns (equity, switches):
+      equity   - preallocated array, equity[i] = balance after bar i
+                 (flat initial_balance for the training bars)
+      switches - list of (bar index, old position, new position)
+    """
+    n = len(close)
+    equity = np.empty(n - 1)
+    equity[:start_idx] = initial_balance
+
+    # Python floats/ints are much faster than numpy scalars in a tight loop
+    closes = close.tolist()
+    codes = signals.tolist()
+
+    balance = float(initial_balance)
+    state = PositionState(HOLD, HOLD, confirmations)
+    switches = []
+
+    for i in range(start_idx, n - 1):
+        # Mark-to-market: long earns (cur - prev) / prev, short the opposite
+        position = state.position
+        if position != HOLD:
+            balance += balance * (position * (closes[i] - closes[i-1]) / closes[i-1])
+
+        signal = codes[i]
+        if signal != SKIP and state.update(signal):
+            balance -= balance * fee_pct
+            switches.append((i, position, signal))
+
+        equity[i] = balance
+
+    return equity, switches
+
+
+def positions_from_switches(switches, length):
+    """Position held after each bar (-1 / 0 / 1), rebuilt from simulate()'s switch list."""
+    if not switches:
+        return np.zeros(length, dtype=np.int8)
+    idx = np.array([i for i, _, _ in switches])
+    new = np.array([HOLD] + [n for _, _, n in switches], dtype=np.int8)
+    # Number of switches seen so far at every bar -> index into `new`
+    seen = np.zeros(length, dtype=np.int64)
+    seen[idx] = np.arange(1, len(idx) + 1)
+    return new[np.maximum.accumulate(seen)]
+
+
+def tested_bars(equity, switches, start_idx):
+    """
+    (equity, positions) of the tested bars only, from the bar before the test
+    period on (the training bars are a flat line). What every tool scores.
+    """
+    equity = np.asarray(equity)
+    return equity[start_idx - 1:], positions_from_switches(switches, len(equity))[start_idx - 1:]
+
+
+def cached_probabilities(df, start_idx, active_features, model_manager, features=None,
+                         ma_window=MA_WINDOW, volume_window=VOLUME_WINDOW, use_cache=True):
+    """
+    Stage one of the signal pipeline (generate_probabilities), through the
+    signal cache: same bars + features + model settings = same probabilities,
+    so they are reused from disk whenever possible.
+    ma_window / volume_window are the build params of `features` when it is
+    passed in (they are part of the cache key either way). A model_manager
+    that was already fit skips the cache: its predictions depend on that model.
+    Returns (prob_up, adx, skipped).
+    """
+    if model_manager is not None and model_manager.fit_count > 0:
+        use_cache = False
+    cache = SignalCache(SIGNAL_CACHE_DIR, max_bytes=SIGNAL_CACHE_MAX_MB * 1024 * 1024) if use_cache else None
+    if cache is not None:
+        cache_key = SignalCache.make_key(df, active_features, dict(
+            model_manager.params(), start_idx=start_idx, window=WINDOW, ma_window=ma_window, volume_window=volume_window))
+        cached = cache.get(cache_key)
+        if cached is not None:
+            print("⚡ Signal cache hit: skipping model training.")
+            return cached['prob_up'], cached['adx'], cached['skipped']
+
+    # --- FEATURE MATRIX ---
+    # Every indicator is computed ONCE for the whole DataFrame.
+    # The walk-forward loop only slices into this matrix.
+    # (The parallel tournament passes in a matrix it already built.)
+    if features is None:
+        features = build_features(df, ma_window=ma_window, volume_window=volume_window)
+    prob_up, adx, skipped = generate_probabilities(features, start_idx, active_features, model_manager)
+    if cache is not None:
+        cache.put(cache_key, prob_up=prob_up, adx=adx, skipped=skipped)
+    return prob_up, adx, skipped
+
+
+def backtest_equity(df, initial_balance=10000, active_features = ['returns', 'range', 'rsi', 'volatility','adx','volume_change', 'relative_volume','dist_from_mean'], features=None, model_manager=None, use_cache=True,
+                    adx_threshold=ADX_THRESHOLD, confidence=CONFIDENCE, contrarian=True, confirmations=3,
+                    ma_window=MA_WINDOW, volume_window=VOLUME_WINDOW):
+    """
+    Signals + simulation without the report / plot.
+    ma_window / volume_window: the build params of `features` (or the ones it gets built with).
+    Returns (equity_series, switches), or None if there is not enough data.
+    """
+    if df is None or len(df) < 50:
+        print("Error: Not enough data to backtest. Need at least 50 rows.")
+        return None
+
+    start_idx = get_start_idx(len(df))
+    if start_idx >= len(df) - 1:
+        print(f"Error: Not enough data to backtest. Need more than {start_idx + 1} rows.")
+        return None
+
+    print(f"Running Realistic Backtest on {len(df)} rows...")
+    print(f"   (Training on first {start_idx} candles, testing on remainder)")
+
+    # --- MODEL LIFECYCLE ---
+    # One cached model for the whole run, refit every RETRAIN_EVERY bars (or on drift)
+    if model_manager is None:
+        model_manager = ModelManager(retrain_every=RETRAIN_EVERY, drift_threshold=DRIFT_THRESHOLD, online=ONLINE_LEARNING)
+
+    # --- SIGNALS ---
+    # Stage one (per-bar prob_up + adx) comes from the cache when it can, stage two
+    # (the rules) always runs, so changing thresholds / the regime flip / fees /
+    # the confirmation logic skips all model work
+    prob_up, adx, skipped = cached_probabilities(df, start_idx, active_features, model_manager, features,
+                                                 ma_window, volume_window, use_cache=use_cache)
+    return equity_from_probabilities(df, start_idx, prob_up, adx, skipped, initial_balance,
+                                     adx_threshold, confidence, contrarian, confirmations)
+
+
+def equity_from_probabilities(df, start_idx, prob_up, adx, skipped, initial_balance=10000, adx_threshold=ADX_THRESHOLD,
+                              confidence=CONFIDENCE, contrarian=True, confirmations=3):
+    """
+    Stage two + the simulation: the rules on already computed probabilities,
+    then the trades. Returns (equity_series, switches), or None.
+    """
+    signals = signals_from_probabilities(prob_up, adx, skipped, adx_threshold, confidence, contrarian)
+
+    # --- THE MAIN LOOP (plain arrays, no per-row df.iloc) ---
+    close = df['close'].to_numpy(dtype=np.float64)
+    equity, switches = simulate(close, signals, start_idx, initial_balance, confirmations=confirmations)
+    for i, old, new in switches:
+        print(f"🔄 SWITCH: {POSITION_NAMES[old]} -> {POSITION_NAMES[new]} at ${close[i]:.2f}")
 
     # --- RESULTS ---
-    if len(equity_curve) < 2:
+    if len(equity) < 2:
         print("Loop finished but no data recorded. Check if DataFrame is empty.")
         return None
 
-    equity_series = pd.Series(equity_curve, index=pd.to_datetime(dates))
+    # The training bars keep their own timestamps, every tested bar i is stamped with bar i+1
+    ts = df['ts'].to_numpy()
+    dates = np.concatenate([ts[:start_idx], ts[start_idx + 1:]])
+    return pd.Series(equity, index=pd.to_datetime(dates)), switches
+
+
+def run_backtest(df, initial_balance=10000, active_features = ['returns', 'range', 'rsi', 'volatility','adx','volume_change', 'relative_volume','dist_from_mean'], features=None, model_manager=None, use_cache=True,
+                 adx_threshold=ADX_THRESHOLD, confidence=CONFIDENCE, contrarian=True, confirmations=3,
+                 ma_window=MA_WINDOW, volume_window=VOLUME_WINDOW):
+    result = backtest_equity(df, initial_balance, active_features, features, model_manager, use_cache,
+                             adx_threshold, confidence, contrarian, confirmations, ma_window, volume_window)
+    if result is None:
+        return None
+    equity_series, _ = result
     
     # Generate Report
-    report = generate_report(equity_series)
-    print("\n--- Professional Performance Report ---")
-    for k, v in report.items():
-        print(f"{k}: {v}")
-    print("------------------------------------------")
+    with metrics.stage("report"):
+        report = generate_report(equity_series)
+        print("\n--- Professional Performance Report ---")
+        for k, v in report.items():
+            print(f"{k}: {v}")
+        print("------------------------------------------")
 
-    plot_results(equity_series,active_features) # Call plotting
+        plot_results(equity_series,active_features) # Call plotting
     return report
 
 def plot_results(equity_series,active_features):
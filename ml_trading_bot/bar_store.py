@@ -0,0 +1,173 @@
+import os
+import shutil
+import numpy as np
+import pandas as pd
+
+# One raw binary file per column. 'ts' is stored as int64 milliseconds, the rest as float64.
+COLUMNS = ['ts', 'open', 'high', 'low', 'close', 'volume']
+DTYPES = {'ts': np.int64, 'open': np.float64, 'high': np.float64,
+          'low': np.float64, 'close': np.float64, 'volume': np.float64}
+
+
+class BarStore:
+    """
+    Local on-disk OHLCV store, keyed by symbol + timeframe.
+
+    Layout: <root>/<SYMBOL>_<TIMEFRAME>/<column>.bin
+    Every column is a flat array that we only ever APPEND to, so adding the
+    newest candles is cheap, and reads are memory-mapped (no CSV parsing).
+    """
+    def __init__(self, root="data/bars"):
+        self.root = root
+
+    def _dir(self, symbol, timeframe):
+        return os.path.join(self.root, f"{symbol.replace('/', '_')}_{timeframe}")
+
+    def _path(self, symbol, timeframe, column):
+        return os.path.join(self._dir(symbol, timeframe), f"{column}.bin")
+
+    def _column_length(self, symbol, timeframe, column):
+        path = self._path(symbol, timeframe, column)
+        if not os.path.exists(path):
+            return 0
+        return os.path.getsize(path) // np.dtype(DTYPES[column]).itemsize
+
+    def _recover(self, symbol, timeframe):
+        """
+        Finishes a merge that crashed between its two renames: the merged
+        directory is complete by then, only the swap is missing.
+        """
+        path = self._dir(symbol, timeframe)
+        if not os.path.exists(path) and os.path.exists(path + ".merged"):
+            os.replace(path + ".merged", path)
+            shutil.rmtree(path + ".old", ignore_errors=True)
+
+    def count(self, symbol, timeframe):
+        """Number of complete rows (a crash mid-append can leave columns uneven)."""
+        self._recover(symbol, timeframe)
+        return min(self._column_length(symbol, timeframe, c) for c in COLUMNS)
+
+    def _load_column(self, symbol, timeframe, column, n_rows):
+        if n_rows == 0:
+            return np.empty(0, dtype=DTYPES[column])
+        return np.memmap(self._path(symbol, timeframe, column), dtype=DTYPES[column], mode='r', shape=(n_rows,))
+
+    def last_timestamp(self, symbol, timeframe):
+        """Timestamp (ms) of the newest stored candle, or None if the store is empty."""
+        n_rows = self.count(symbol, timeframe)
+        if n_rows == 0:
+            return None
+        return int(self._load_column(symbol, timeframe, 'ts', n_rows)[-1])
+
+    def append(self, symbol, timeframe, ohlcv):
+        """
+        Appends raw CCXT rows ([ts, open, high, low, close, volume]).
+        Rows are sorted and de-duplicated, and anything not newer than the
+        last stored candle is dropped. Returns how many rows were written.
+        """
+        if ohlcv is None or len(ohlcv) == 0:
+            return 0
+
+        rows = np.asarray(ohlcv, dtype=np.float64)
+        ts = rows[:, 0].astype(np.int64)
+        ts, first_idx = np.unique(ts, return_index=True) # sorts + dedupes
+        rows = rows[first_idx]
+
+        last_ts = self.last_timestamp(symbol, timeframe)
+        if last_ts is not None:
+            newer = ts > last_ts
+            ts, rows = ts[newer], rows[newer]
+        if len(ts) == 0:
+            return 0
+
+        os.makedirs(self._dir(symbol, timeframe), exist_ok=True)
+
+        # Cut off any half-written tail left by a crash, so the columns stay aligned
+        n_rows = self.count(symbol, timeframe)
+        for column in COLUMNS:
+            path = self._path(symbol, timeframe, column)
+            if os.path.exists(path):
+                with open(path, 'r+b') as f:
+                    f.truncate(n_rows * np.dtype(DTYPES[column]).itemsize)
+
+        for i, column in enumerate(COLUMNS):
+            values = ts if column == 'ts' else rows[:, i]
+            with open(self._path(symbol, timeframe, column), 'ab') as f:
+                f.write(np.ascontiguousarray(values, dtype=DTYPES[column]).tobytes())
+
+        return len(ts)
+
+    def merge(self, symbol, timeframe, ohlcv):
+        """
+        Like append, but also accepts rows OLDER than what is stored
+        (e.g. a historical backfill). Appends when it can, otherwise
+        rewrites the columns sorted + de-duplicated. Returns rows added.
+        """
+        if ohlcv is None or len(ohlcv) == 0:
+            return 0
+
+        rows = np.asarray(ohlcv, dtype=np.float64)
+        last_ts = self.last_timestamp(symbol, timeframe)
+        if last_ts is None or rows[:, 0].min() > last_ts:
+            return self.append(symbol, timeframe, rows)
+
+        existing = self.read(symbol, timeframe)
+        old = np.column_stack([
+            existing['ts'].to_numpy(dtype='datetime64[ms]').astype(np.int64).astype(np.float64),
+            existing[COLUMNS[1:]].to_numpy(dtype=np.float64),
+        ])
+        combined = np.vstack([old, rows])
+        # Keep the stored row when a timestamp exists in both
+        _, first_idx = np.unique(combined[:, 0].astype(np.int64), return_index=True)
+        merged = combined[first_idx]
+
+        # Write every column into a NEW sibling directory, then swap the whole
+        # directory in, so a crash never mixes merged and old columns
+        path = self._dir(symbol, timeframe)
+        merged_path = path + ".merged"
+        for leftover in (merged_path, path + ".old"): # a crash mid-write / mid-cleanup
+            shutil.rmtree(leftover, ignore_errors=True)
+        os.makedirs(merged_path)
+        for i, column in enumerate(COLUMNS):
+            with open(os.path.join(merged_path, f"{column}.bin"), 'wb') as f:
+                f.write(np.ascontiguousarray(merged[:, i], dtype=DTYPES[column]).tobytes())
+                f.flush()
+                os.fsync(f.fileno())
+        os.replace(path, path + ".old")
+        os.replace(merged_path, path) # a crash right before this is finished by _recover()
+        shutil.rmtree(path + ".old", ignore_errors=True)
+
+        return len(merged) - len(old)
+
+    def read_arrays(self, symbol, timeframe, start=None, end=None, last_n=None):
+        """
+        Same range rules as read(), but returns {column: numpy array} with
+        'ts' as int64 ms. Only the selected rows are copied out of the memmap,
+        so the live loop can pick up just the new candles without a DataFrame.
+        """
+        n_rows = self.count(symbol, timeframe)
+        ts = self._load_column(symbol, timeframe, 'ts', n_rows)
+
+        lo, hi = 0, n_rows
+        if start is not None:
+            lo = int(np.searchsorted(ts, _to_ms(start), side='left'))
+        if end is not None:
+            hi = int(np.searchsorted(ts, _to_ms(end), side='left'))
+        if last_n is not None:
+            lo = max(lo, hi - last_n)
+
+        return {column: np.array(self._load_column(symbol, timeframe, column, n_rows)[lo:hi]) for column in COLUMNS}
+
+    def read(self, symbol, timeframe, start=None, end=None, last_n=None):
+        """
+        Fast range read. start / end are anything pd.Timestamp understands
+        (end is exclusive). last_n keeps only the newest N rows of the range.
+        Returns a DataFrame with the same columns as data_loader produced.
+        """
+        data = self.read_arrays(symbol, timeframe, start, end, last_n)
+        data['ts'] = pd.to_datetime(data['ts'], unit='ms')
+        return pd.DataFrame(data)
+
+
+def _to_ms(when):
+    return int(pd.Timestamp(when).value // 1_000_000)
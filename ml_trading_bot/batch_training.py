@@ -0,0 +1,171 @@
+import os
+import tempfile
+from multiprocessing import Pool
+
+import numpy as np
+
+from backtester import WINDOW
+from config import RETRAIN_EVERY, DRIFT_THRESHOLD, ONLINE_LEARNING, SIGNAL_CACHE_DIR, SIGNAL_CACHE_MAX_MB
+from model_manager import ModelManager
+from signal_cache import SignalCache
+from strategy import MA_WINDOW, VOLUME_WINDOW, MIN_TRAIN_ROWS
+
+# Filled in once per worker process by _init_worker
+_worker_data = {}
+
+
+def training_plan(features, start_idx, window=WINDOW):
+    """
+    The rows every bar trains on, worked out ONCE for all feature subsets.
+    Same rules as generate_probabilities: bar i looks at the `window` rows
+    before it, drops every row with a NaN in ANY column (so the rows don't
+    depend on the subset), and needs 30 of them.
+    Returns (valid_rows, plan, too_short):
+      valid_rows - indices of the NaN-free rows
+      plan       - int array of (bar, lo, hi): the bar trains on
+                   valid_rows[lo:hi-1] and predicts valid_rows[hi-1]
+      too_short  - bars without a full window before them (SKIP)
+    """
+    values = features.drop(columns=['ts']).to_numpy(dtype=np.float64)
+    valid_rows = np.flatnonzero(~np.isnan(values).any(axis=1))
+
+    bars = np.arange(start_idx, len(features) - 1)
+    # iloc[i-50:i] with a negative start is an empty window
+    too_short = bars[bars < window]
+    bars = bars[bars >= window]
+    lo = np.searchsorted(valid_rows, bars - window)
+    hi = np.searchsorted(valid_rows, bars)
+    enough = hi - lo >= MIN_TRAIN_ROWS
+    return valid_rows, np.column_stack([bars[enough], lo[enough], hi[enough]]), too_short
+
+
+def _init_worker(matrix_path, columns, valid_rows, plan, model_params):
+    """
+    Runs once in every worker process. The feature matrix is a READ-ONLY
+    memory map, shared by all workers through the OS page cache.
+    """
+    _worker_data['matrix'] = np.load(matrix_path, mmap_mode='r')
+    _worker_data['columns'] = columns
+    _worker_data['valid_rows'] = valid_rows
+    _worker_data['plan'] = plan
+    _worker_data['model_params'] = model_params
+
+
+def _predict(model_manager, X, pending, prob_up):
+    """Predicts every pending bar with the current model in ONE predict_proba call."""
+    if not pending:
+        return
+    bars, rows = zip(*pending)
+    probs = model_manager.predict_proba(X[list(rows)])
+    # Same as strategy._prob_up: a one-class model says 0
+    prob_up[list(bars)] = probs[:, 1] if probs.shape[1] > 1 else 0
+    pending.clear()
+
+
+def _subset_probabilities(subset):
+    """
+    Worker: the walk-forward model pass for ONE feature subset, on plain arrays.
+    The model only changes when it is refit (or partial_fit, online), so the
+    bars in between are predicted together when the model is about to change.
+    Returns (prob_up, skipped) for every bar.
+    """
+    matrix, columns = _worker_data['matrix'], _worker_data['columns']
+    valid_rows, plan = _worker_data['valid_rows'], _worker_data['plan']
+    X = np.ascontiguousarray(matrix[:, [columns.index(f) for f in subset]])
+    y = matrix[:, columns.index('target')].astype(int)
+
+    model_manager = ModelManager(**_worker_data['model_params'])
+    prob_up = np.full(len(matrix), np.nan)
+    skipped = np.zeros(len(matrix), dtype=bool)
+    pending = [] # (bar, row) predicted by the current model
+    for bar, lo, hi in plan.tolist():
+        train_rows = valid_rows[lo:hi - 1]
+        try:
+            # The steps of ModelManager.prepare, predicting before the model changes
+            X_train, y_train = X[train_rows], y[train_rows]
+            model_manager.bars_since_fit += 1
+            if model_manager.needs_retrain(X_train, subset):
+                _predict(model_manager, X, pending, prob_up)
+                model_manager.fit(X_train, y_train, subset)
+            elif model_manager.online:
+                _predict(model_manager, X, pending, prob_up)
+                model_manager.partial_update(X_train[-1:], y_train[-1:])
+            pending.append((bar, valid_rows[hi - 1]))
+        except Exception as e:
+            print(e)
+            skipped[bar] = True
+    _predict(model_manager, X, pending, prob_up)
+    return prob_up, skipped
+
+
+def subset_probabilities(features, start_idx, subsets, model_manager=None, workers=None):
+    """
+    Stage one of the signal pipeline for MANY feature subsets at once, e.g.
+    every tournament combo. The feature matrix, target and the per-bar
+    training rows are built once and shared read-only; each subset runs in
+    its own worker. Gives the same numbers as generate_probabilities per subset.
+    Returns (prob_up, adx, skipped):
+      prob_up - bars x subsets matrix (NaN = no prediction)
+      adx     - the ADX per bar (the same for every subset)
+      skipped - bars x subsets, True where the model failed (SKIP)
+    """
+    model_manager = model_manager or ModelManager(retrain_every=RETRAIN_EVERY, drift_threshold=DRIFT_THRESHOLD,
+                                                  online=ONLINE_LEARNING)
+    columns = [c for c in features.columns if c != 'ts']
+    matrix = features[columns].to_numpy(dtype=np.float64)
+    valid_rows, plan, too_short = training_plan(features, start_idx)
+
+    adx = np.full(len(features), np.nan)
+    adx[plan[:, 0]] = matrix[valid_rows[plan[:, 2] - 1], columns.index('adx')]
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        matrix_path = os.path.join(tmp_dir, "features.npy")
+        np.save(matrix_path, matrix)
+        with Pool(processes=min(workers or os.cpu_count(), len(subsets)), initializer=_init_worker,
+                  initargs=(matrix_path, columns, valid_rows, plan, model_manager.params())) as pool:
+            results = pool.map(_subset_probabilities, [list(s) for s in subsets])
+
+    prob_up = np.column_stack([p for p, _ in results])
+    skipped = np.column_stack([s for _, s in results])
+    skipped[too_short] = True
+    return prob_up, adx, skipped
+
+
+def cached_subset_probabilities(df, start_idx, subsets, model_manager=None, features=None, workers=None, use_cache=True):
+    """
+    subset_probabilities through the signal cache, under the same keys as
+    backtester.cached_probabilities: subsets that are cached are not
+    trained again, and the new ones are stored for later single backtests.
+    Returns (prob_up, adx, skipped), all bars x subsets (like the cache
+    entries, adx is NaN where there is no prediction).
+    """
+    model_manager = model_manager or ModelManager(retrain_every=RETRAIN_EVERY, drift_threshold=DRIFT_THRESHOLD,
+                                                  online=ONLINE_LEARNING)
+    features = features if features is not None else df
+    n = len(features)
+    prob_up = np.full((n, len(subsets)), np.nan)
+    adx = np.full((n, len(subsets)), np.nan)
+    skipped = np.zeros((n, len(subsets)), dtype=bool)
+
+    cache = SignalCache(SIGNAL_CACHE_DIR, max_bytes=SIGNAL_CACHE_MAX_MB * 1024 * 1024) if use_cache else None
+    params = dict(model_manager.params(), start_idx=start_idx, window=WINDOW, ma_window=MA_WINDOW, volume_window=VOLUME_WINDOW)
+    keys = [SignalCache.make_key(df, list(s), params) for s in subsets] if cache is not None else [None] * len(subsets)
+    todo = []
+    for k, key in enumerate(keys):
+        cached = cache.get(key) if cache is not None else None
+        if cached is None:
+            todo.append(k)
+        else:
+            prob_up[:, k], adx[:, k], skipped[:, k] = cached['prob_up'], cached['adx'], cached['skipped']
+    print(f"⚡ {len(subsets) - len(todo)} of {len(subsets)} subsets from the signal cache, training {len(todo)}")
+
+    if todo:
+        new_prob, new_adx, new_skipped = subset_probabilities(features, start_idx, [subsets[k] for k in todo],
+                                                              model_manager, workers)
+        for j, k in enumerate(todo):
+            prob_up[:, k], skipped[:, k] = new_prob[:, j], new_skipped[:, j]
+            # generate_probabilities leaves the ADX empty where there is no prediction
+            adx[:, k] = np.where(np.isnan(new_prob[:, j]), np.nan, new_adx)
+            if cache is not None:
+                cache.put(keys[k], prob_up=prob_up[:, k], adx=adx[:, k], skipped=skipped[:, k])
+    return prob_up, adx, skipped
@@ -0,0 +1,234 @@
+import argparse
+import datetime
+import json
+import os
+import platform
+import subprocess
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+from sklearn.ensemble import RandomForestClassifier
+
+from backtester import get_start_idx, generate_signals, simulate
+from model_manager import ModelManager
+from parallel_tournament import run_parallel_tournament
+from performance_metrics import generate_report
+import adx_kernel
+from strategy import FEATURE_COLUMNS, build_features, calculate_adx, calculate_adx_pandas
+from streaming_indicators import StreamingADX, StreamingFeatures
+
+HISTORY_FILE = "benchmark_history.json"
+REGRESSION_THRESHOLD = 0.20 # flag stages that got >20% slower than the previous run
+
+
+def make_synthetic_ohlcv(n_bars, seed=42, start_price=50000.0, freq='h'):
+    """
+    Offline OHLCV generator: geometric Brownian motion closes with
+    plausible high/low wicks and log-normal volume. Same seed = same data.
+    """
+    rng = np.random.default_rng(seed)
+    log_returns = rng.normal(0, 0.01, n_bars)
+    close = start_price * np.exp(np.cumsum(log_returns))
+    open_ = np.concatenate([[start_price], close[:-1]])
+    wick = np.abs(rng.normal(0, 0.004, (2, n_bars)))
+    high = np.maximum(open_, close) * (1 + wick[0])
+    low = np.minimum(open_, close) * (1 - wick[1])
+    volume = rng.lognormal(mean=0.0, sigma=1.0, size=n_bars)
+    ts = pd.date_range("2020-01-01", periods=n_bars, freq=freq)
+    return pd.DataFrame({'ts': ts, 'open': open_, 'high': high, 'low': low, 'close': close, 'volume': volume})
+
+
+def _timed(fn, *args, **kwargs):
+    start = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return time.perf_counter() - start, result
+
+
+def _best_of(repeats, fn, *args, **kwargs):
+    """Fastest of `repeats` runs (the least noisy number for regression tracking)."""
+    runs = [_timed(fn, *args, **kwargs) for _ in range(repeats)]
+    return min(seconds for seconds, _ in runs), runs[-1][1]
+
+
+def check_streaming_parity(df, n_rows=2000, tol=1e-9):
+    """The streaming indicators must match build_features. Returns the worst column error."""
+    sample = df.iloc[:n_rows]
+    batch = build_features(sample)
+    engine = StreamingFeatures()
+    rows = [engine.update(b.ts, b.open, b.high, b.low, b.close, b.volume) for b in sample.itertuples(index=False)]
+    stream = pd.DataFrame(rows)
+
+    worst = 0.0
+    for column in FEATURE_COLUMNS:
+        a = batch[column].to_numpy(dtype=np.float64)
+        b = stream[column].to_numpy(dtype=np.float64)
+        if not np.array_equal(np.isnan(a), np.isnan(b)):
+            raise AssertionError(f"Streaming parity: NaN pattern differs for '{column}'")
+        mask = ~np.isnan(a) & np.isfinite(a)
+        err = float(np.max(np.abs(a[mask] - b[mask]) / np.maximum(1.0, np.abs(a[mask])))) if mask.any() else 0.0
+        if err > tol:
+            raise AssertionError(f"Streaming parity: '{column}' off by {err:.2e}")
+        worst = max(worst, err)
+    return worst
+
+
+def _relative_error(expected, actual, name):
+    if not np.array_equal(np.isnan(expected), np.isnan(actual)):
+        raise AssertionError(f"ADX parity: NaN pattern differs for the {name}")
+    mask = np.isfinite(expected)
+    return float(np.max(np.abs(expected[mask] - actual[mask]) / np.maximum(1.0, np.abs(expected[mask])))) if mask.any() else 0.0
+
+
+def check_adx_parity(df, chunk=97, tol=1e-9):
+    """
+    The NumPy ADX kernel must match the pandas reference in all three forms:
+    one batch call, chunk by chunk with the carried state, and StreamingADX
+    candle by candle. Returns the worst relative error.
+    """
+    expected = calculate_adx_pandas(df).to_numpy(dtype=np.float64)
+    high, low, close = (df[c].to_numpy(dtype=np.float64) for c in ('high', 'low', 'close'))
+
+    batch = calculate_adx(df).to_numpy(dtype=np.float64)
+    chunks, state = [], None
+    for start in range(0, len(df), chunk):
+        values, state = adx_kernel.adx(high[start:start + chunk], low[start:start + chunk], close[start:start + chunk],
+                                       state=state)
+        chunks.append(values)
+    streaming_adx = StreamingADX()
+    stream = np.array([streaming_adx.update(h, l, c) for h, l, c in zip(high, low, close)])
+
+    worst = 0.0
+    for name, actual in [('batch kernel', batch), ('chunked kernel', np.concatenate(chunks)), ('StreamingADX', stream)]:
+        err = _relative_error(expected, actual, name)
+        if err > tol:
+            raise AssertionError(f"ADX parity: the {name} is off by {err:.2e}")
+        worst = max(worst, err)
+    return worst
+
+
+def run_stages(n_bars, active_features, signal_bars=200, stream_bars=100_000, fit_repeats=20, repeats=3, tournament_bars=600):
+    """Times every pipeline stage on n_bars synthetic candles. Returns {stage: seconds}."""
+    df = make_synthetic_ohlcv(n_bars)
+    results = {}
+
+    # 1. Indicators
+    results['adx'], _ = _best_of(repeats, calculate_adx, df)
+    results['adx_pandas'], _ = _best_of(repeats, calculate_adx_pandas, df)
+    results['feature_build'], features = _best_of(repeats, build_features, df)
+
+    n_stream = min(n_bars, stream_bars)
+    engine = StreamingFeatures()
+    start = time.perf_counter()
+    for b in df.iloc[:n_stream].itertuples(index=False):
+        engine.update(b.ts, b.open, b.high, b.low, b.close, b.volume)
+    results['streaming_per_bar'] = (time.perf_counter() - start) / n_stream
+
+    # 2. Model fit / predict on one 50-row window (the per-bar unit of work)
+    window = features.iloc[-51:-1].dropna()
+    X, y = window[active_features], window['target']
+    model = RandomForestClassifier(n_estimators=100, max_depth=5, random_state=42)
+    results['fit'], _ = _best_of(fit_repeats, model.fit, X.iloc[:-1], y.iloc[:-1])
+    results['predict'], _ = _best_of(fit_repeats, model.predict_proba, X.iloc[[-1]])
+
+    # 3. Walk-forward signal pass over the last signal_bars bars
+    start_idx = max(get_start_idx(n_bars), n_bars - signal_bars - 1)
+    results['signal_pass'], signals = _timed(generate_signals, features, start_idx, active_features, ModelManager())
+
+    # 4. Simulation loop over ALL bars (random signals, so the whole array is exercised)
+    random_signals = np.random.default_rng(0).choice(np.array([-1, 0, 1], dtype=np.int8), n_bars)
+    close = df['close'].to_numpy(dtype=np.float64)
+    results['simulate'], (equity, _) = _best_of(repeats, simulate, close, random_signals, 100)
+
+    # 5. Report
+    equity_series = pd.Series(equity, index=df['ts'].iloc[1:])
+    results['report'], _ = _best_of(repeats, generate_report, equity_series)
+
+    # 6. Batched feature tournament on the last tournament_bars bars: the first two
+    #    features alone + together (3 combos), no PNGs, no signal cache
+    tail = df.iloc[-tournament_bars:].reset_index(drop=True)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        results['tournament'], _ = _timed(run_parallel_tournament, tail, active_features[:2],
+                                          log_file=os.path.join(tmp_dir, "tournament.csv"), workers=1,
+                                          batched=True, plot=False, use_cache=False)
+
+    return results
+
+
+def _git_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], stderr=subprocess.DEVNULL).decode().strip()
+    except Exception:
+        return None
+
+
+def load_history(path=HISTORY_FILE):
+    if not os.path.exists(path):
+        return []
+    with open(path) as f:
+        return json.load(f)
+
+
+def compare_with_previous(history, entry):
+    """Prints the change per stage vs. the last run and returns the regressions."""
+    if not history:
+        return []
+    previous = history[-1]['results']
+    regressions = []
+    for size, stages in entry['results'].items():
+        for stage, seconds in stages.items():
+            before = previous.get(size, {}).get(stage)
+            if not before:
+                continue
+            change = (seconds - before) / before
+            flag = "🔴" if change > REGRESSION_THRESHOLD else "🟢" if change < -REGRESSION_THRESHOLD else "⚪"
+            print(f"{flag} {size:>10} bars | {stage:<18} {before:.6f}s -> {seconds:.6f}s ({change:+.1%})")
+            if change > REGRESSION_THRESHOLD:
+                regressions.append((size, stage, change))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline backtest benchmark (synthetic OHLCV, no network).")
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1_000, 10_000, 100_000],
+                        help="Series lengths to benchmark (1k .. 10M bars)")
+    parser.add_argument('--features', nargs='+', default=["returns", "rsi", "adx", "dist_from_mean"])
+    parser.add_argument('--label', default="", help="Free text stored with the run")
+    parser.add_argument('--history', default=HISTORY_FILE)
+    args = parser.parse_args()
+
+    print("🔬 Checking streaming indicator parity...")
+    print(f"   worst relative error: {check_streaming_parity(make_synthetic_ohlcv(2000)):.2e}")
+    print("🔬 Checking ADX kernel parity...")
+    print(f"   worst relative error: {check_adx_parity(make_synthetic_ohlcv(5000)):.2e}")
+
+    entry = {
+        'timestamp': datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        'commit': _git_commit(),
+        'label': args.label,
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'pandas': pd.__version__,
+        'results': {},
+    }
+    for n_bars in args.sizes:
+        print(f"⏱️ Benchmarking {n_bars} bars...")
+        stages = run_stages(n_bars, args.features)
+        for stage, seconds in stages.items():
+            print(f"   {stage:<18} {seconds:.6f}s")
+        entry['results'][str(n_bars)] = stages
+
+    history = load_history(args.history)
+    regressions = compare_with_previous(history, entry)
+    history.append(entry)
+    with open(args.history, 'w') as f:
+        json.dump(history, f, indent=2)
+
+    if regressions:
+        print(f"⚠️ {len(regressions)} stage(s) regressed by more than {REGRESSION_THRESHOLD:.0%}")
+    print(f"💾 Saved to {args.history}")
+
+
+if __name__ == "__main__":
+    main()
@@ -8,6 +8,39 @@ API_KEY = os.getenv('ALPACA_API_KEY')
 SECRET_KEY = os.getenv('ALPACA_SECRET_KEY')
 SYMBOL = os.getenv('SYMBOL')
 TIMEFRAME = os.getenv('TIMEFRAME')
+# Portfolio mode: comma separated list, e.g. SYMBOLS=BTC/USD,ETH/USD (defaults to SYMBOL)
+SYMBOLS = [s.strip() for s in os.getenv('SYMBOLS', SYMBOL or '').split(',') if s.strip()]
+
+# Model lifecycle (see model_manager.py)
+RETRAIN_EVERY = int(os.getenv('RETRAIN_EVERY', 24))     # Refit the model every N bars
+DRIFT_THRESHOLD = float(os.getenv('DRIFT_THRESHOLD')) if os.getenv('DRIFT_THRESHOLD') else None
+ONLINE_LEARNING = os.getenv('ONLINE_LEARNING', 'false').lower() == 'true' # SGD + partial_fit
+
+# Signal cache (see signal_cache.py)
+SIGNAL_CACHE_DIR = os.getenv('SIGNAL_CACHE_DIR', 'data/signal_cache')
+SIGNAL_CACHE_MAX_MB = int(os.getenv('SIGNAL_CACHE_MAX_MB', 500))
+
+# Model artifacts (see model_store.py): the live bot warm-starts from the newest one
+MODEL_DIR = os.getenv('MODEL_DIR', 'data/models')
+MODEL_KEEP_VERSIONS = int(os.getenv('MODEL_KEEP_VERSIONS', 5))
+
+# Walk-forward evaluation (see walk_forward.py)
+WALK_FORWARD_TRAIN = int(os.getenv('WALK_FORWARD_TRAIN', 500)) # bars the model is fit on per fold
+WALK_FORWARD_TEST = int(os.getenv('WALK_FORWARD_TEST', 100))   # bars traded out-of-sample per fold
+WALK_FORWARD_STEP = int(os.getenv('WALK_FORWARD_STEP')) if os.getenv('WALK_FORWARD_STEP') else None # default = TEST
+WALK_FORWARD_ANCHORED = os.getenv('WALK_FORWARD_ANCHORED', 'false').lower() == 'true' # expanding train window
+
+# Streaming bar ingestion (see stream_ingest.py)
+STREAM_FEED = os.getenv('STREAM_FEED', 'websocket') # 'websocket' (ccxt.pro watch_trades) or 'polling' (REST fetch_trades)
+STREAM_CLOSE_GRACE = float(os.getenv('STREAM_CLOSE_GRACE', 1.0)) # seconds late trades may still arrive after a candle ends
+
+# Multi-timeframe data (see resampler.py): keep ONE base series (e.g. 1m) and derive
+# TIMEFRAME (and any other timeframe) from it locally. Unset = fetch TIMEFRAME directly.
+BASE_TIMEFRAME = os.getenv('BASE_TIMEFRAME')
+
+# Instrumentation (see instrumentation.py)
+METRICS_FILE = os.getenv('METRICS_FILE', 'metrics.jsonl') # per-cycle JSON lines + end-of-run summary
+PROFILE = os.getenv('PROFILE', 'false').lower() == 'true'  # opt-in cProfile of backtests / the live loop
 
 def get_exchange():
     exchange = ccxt.alpaca({
@@ -2,10 +2,16 @@
 import ccxt
 import pandas as pd
 import time
-from config import SYMBOL, TIMEFRAME, API_KEY, SECRET_KEY
+from config import SYMBOL, TIMEFRAME, API_KEY, SECRET_KEY, BASE_TIMEFRAME
+from bar_store import BarStore
+from resampler import Resampler
+from instrumentation import metrics
 
 import datetime
 import time # Ensure time is imported
+import random
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
 
 
@@ -29,26 +35,58 @@ def get_exchange():
     return exchange    
 
 
-def get_historical_data(symbol, timeframe, target_rows=1000):
-    exchange = get_exchange()
-    
-    # 1. SETUP: Start 60 days ago to be safe
-    # This ensures we have plenty of runway to find 1000 rows
-    start_time = datetime.datetime.now(datetime.timezone.utc) - datetime.timedelta(days=60)
-    since = int(start_time.timestamp() * 1000)
+def get_fetch_start(store, symbol, timeframe, now_ms=None):
+    """
+    Where the next fetch should start (ms): right after the newest stored
+    candle, or 60 days back if the store is empty.
+    """
+    last_stored = store.last_timestamp(symbol, timeframe)
+    if last_stored is None:
+        now = datetime.datetime.now(datetime.timezone.utc) if now_ms is None else \
+            datetime.datetime.fromtimestamp(now_ms / 1000, tz=datetime.timezone.utc)
+        start_time = now - datetime.timedelta(days=60)
+        print(f"🔄 Fetching data for {symbol} starting from {start_time.strftime('%Y-%m-%d')}...")
+        return int(start_time.timestamp() * 1000)
+
+    print(f"🔄 Fetching new {symbol} candles since {pd.to_datetime(last_stored, unit='ms')}...")
+    return last_stored + 1
+
+
+def closed_candles(ohlcv, timeframe_ms, now_ms=None):
+    """
+    Drops the candle that is still forming. It must NOT be stored, otherwise
+    we would never refetch its final values.
+    """
+    now_ms = now_ms if now_ms is not None else int(time.time() * 1000)
+    return [row for row in ohlcv if row[0] + timeframe_ms <= now_ms]
+
+
+@metrics.timed("data_fetch")
+def update_store(symbol, timeframe, store=None, exchange=None):
+    """
+    Fetches only the candles NEWER than the last stored timestamp from
+    Alpaca and appends the closed ones to the BarStore; an empty store
+    starts 60 days back. Returns how many candles were added.
+    Pass an exchange to reuse one API session across symbols.
+    """
+    exchange = exchange or get_exchange()
+    store = store or BarStore()
     
-    print(f"🔄 Fetching data for {symbol} starting from {start_time.strftime('%Y-%m-%d')}...")
+    # 1. SETUP: Resume right after the newest candle we already have.
+    # Empty store -> start 60 days ago to be safe
+    now_ms = exchange.milliseconds()
+    since = get_fetch_start(store, symbol, timeframe, now_ms)
+    timeframe_ms = exchange.parse_timeframe(timeframe) * 1000
 
     all_ohlcv = []
     
-    while len(all_ohlcv) < target_rows:
+    while True:
         try:
             # 2. FETCH: Ask for 1000 rows at a time
             # Alpaca v2 allows larger limits, which speeds this up
             batch = exchange.fetch_ohlcv(symbol, timeframe, since=since, limit=1000)
             
             if not batch or len(batch) == 0:
-                print("🏁 API returned no more data.")
                 break
             
             # 3. COLLECT
@@ -64,6 +102,10 @@ def get_historical_data(symbol, timeframe, target_rows=1000):
                 break
                 
             since = last_timestamp + 1 # Start next batch 1ms after the last candle
+
+            # A short batch means we caught up with the present
+            if len(batch) < 1000:
+                break
             
             time.sleep(0.2) # Friendly rate limit
 
@@ -71,18 +113,157 @@ def get_historical_data(symbol, timeframe, target_rows=1000):
             print(f"⚠️ Data Fetch Error: {e}")
             break
 
-    if not all_ohlcv:
+    # 5. STORE: append only closed candles
+    added = store.append(symbol, timeframe, closed_candles(all_ohlcv, timeframe_ms, now_ms))
+    print(f"💾 Stored {added} new candles.")
+    return added
+
+
+def get_historical_data(symbol, timeframe, target_rows=1000, store=None, exchange=None, base_timeframe=BASE_TIMEFRAME):
+    """
+    Returns the newest target_rows candles from the local BarStore,
+    after update_store() brought it up to date.
+    With a base_timeframe (e.g. '1m') only the base bars are fetched and
+    the timeframe is derived from them (see get_resampled_data).
+    """
+    if base_timeframe and base_timeframe != timeframe:
+        return get_resampled_data(symbol, timeframe, base_timeframe, target_rows, store, exchange)
+
+    store = store or BarStore()
+    update_store(symbol, timeframe, store, exchange)
+
+    if store.count(symbol, timeframe) == 0:
         return None
 
-    # 5. FORMAT
-    df = pd.DataFrame(all_ohlcv, columns=['ts', 'open', 'high', 'low', 'close', 'volume'])
-    df['ts'] = pd.to_datetime(df['ts'], unit='ms')
-    df = df.drop_duplicates(subset=['ts']).sort_values('ts').reset_index(drop=True)
-    
-    # Trim to exactly target_rows if we got too many
-    if len(df) > target_rows:
-        df = df.iloc[-target_rows:].reset_index(drop=True)
+    # 6. READ: newest target_rows straight from the memory-mapped store
+    df = store.read(symbol, timeframe, last_n=target_rows)
     
     print(f"✅ Final Dataset: {len(df)} rows ready for ML.")
-    df.to_csv("btc_hourly.csv", index = False)
-    return df
\ No newline at end of file
+    return df
+
+
+def get_resampled_data(symbol, timeframe, base_timeframe='1m', target_rows=1000, store=None, exchange=None):
+    """
+    Brings the base bars up to date (one fetch, whatever timeframes the
+    strategies use) and returns the newest target_rows CLOSED candles of
+    `timeframe`, aggregated locally by the Resampler.
+    An empty store only gets 60 days of base bars; use backfill_history
+    (then Resampler.rebuild) for a longer history.
+    """
+    store = store or BarStore()
+    update_store(symbol, base_timeframe, store, exchange)
+
+    df = Resampler(store, base_timeframe).read(symbol, timeframe, last_n=target_rows)
+    if df.empty:
+        return None
+
+    print(f"✅ Final Dataset: {len(df)} {timeframe} rows (from {base_timeframe} bars) ready for ML.")
+    return df
+
+
+class RateLimiter:
+    """Thread-safe spacing between API calls (ccxt's own throttle is per-thread)."""
+    def __init__(self, calls_per_second):
+        self.interval = 1.0 / calls_per_second
+        self.lock = threading.Lock()
+        self.next_call = 0.0
+
+    def wait(self):
+        with self.lock:
+            now = time.monotonic()
+            wait_for = self.next_call - now
+            self.next_call = max(now, self.next_call) + self.interval
+        if wait_for > 0:
+            time.sleep(wait_for)
+
+
+def _fetch_chunk(exchange, limiter, symbol, timeframe, chunk_start, chunk_end, max_retries=5, backoff=1.0):
+    """
+    Fetches every candle in [chunk_start, chunk_end) (ms). Failed requests are
+    retried with exponential backoff + jitter before the chunk gives up.
+    """
+    rows = []
+    since = chunk_start
+    while since < chunk_end:
+        for attempt in range(max_retries):
+            try:
+                limiter.wait()
+                batch = exchange.fetch_ohlcv(symbol, timeframe, since=since, limit=1000)
+                break
+            except Exception as e:
+                if attempt == max_retries - 1:
+                    raise
+                delay = backoff * (2 ** attempt) + random.uniform(0, backoff)
+                print(f"   ⚠️ Chunk {pd.to_datetime(chunk_start, unit='ms')} failed ({e}), retrying in {delay:.1f}s")
+                time.sleep(delay)
+
+        batch = [row for row in batch if row[0] < chunk_end]
+        if not batch:
+            break
+        rows.extend(batch)
+        if batch[-1][0] < since: # exchange ignored `since`, don't loop forever
+            break
+        since = batch[-1][0] + 1
+    return rows
+
+
+@metrics.timed("data_fetch")
+def backfill_history(symbol, timeframe, start, end=None, store=None, exchange=None,
+                     max_workers=4, calls_per_second=None, max_retries=5, flush_every=50):
+    """
+    Pulls a long date range (e.g. years of 1m bars) into the BarStore.
+    The range is split into 1000-candle chunks that are fetched concurrently
+    (all threads share one RateLimiter), failed chunks are retried with
+    backoff, and the results are de-duplicated, sorted and merged into the
+    store every `flush_every` chunks. Returns (rows added, failed chunk starts).
+    A flush with rows older than the stored ones rewrites the WHOLE series
+    (BarStore.merge), and chunks finish out of order, so for years of 1m
+    bars raise flush_every to merge in fewer, larger batches.
+    """
+    exchange = exchange or get_exchange()
+    store = store or BarStore()
+    # Default to the exchange's own limit (ccxt rateLimit = ms between calls)
+    limiter = RateLimiter(calls_per_second or 1000 / exchange.rateLimit)
+
+    timeframe_ms = exchange.parse_timeframe(timeframe) * 1000
+    now_ms = exchange.milliseconds()
+    start_ms = int(pd.Timestamp(start).value // 1_000_000)
+    end_ms = int(pd.Timestamp(end).value // 1_000_000) if end is not None else now_ms
+
+    chunk_ms = 1000 * timeframe_ms
+    chunks = [(s, min(s + chunk_ms, end_ms)) for s in range(start_ms, end_ms, chunk_ms)]
+    print(f"🔄 Backfilling {symbol} {timeframe}: {len(chunks)} chunks on {max_workers} threads...")
+
+    added = 0
+    failed = []
+    pending_rows = []
+    done = 0
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        futures = {pool.submit(_fetch_chunk, exchange, limiter, symbol, timeframe, s, e, max_retries): s for s, e in chunks}
+        for future in as_completed(futures):
+            done += 1
+            try:
+                pending_rows.extend(future.result())
+            except Exception as e:
+                failed.append(futures[future])
+                print(f"   ❌ Chunk {pd.to_datetime(futures[future], unit='ms')} failed for good: {e}")
+
+            if pending_rows and (done % flush_every == 0 or done == len(chunks)):
+                added += store.merge(symbol, timeframe, closed_candles(pending_rows, timeframe_ms, now_ms))
+                pending_rows = []
+                print(f"   📥 {done}/{len(chunks)} chunks done, {added} new candles stored")
+
+    print(f"✅ Backfill finished: {added} new candles, {len(failed)} failed chunks.")
+    return added, failed
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Backfill historical candles into the local BarStore.")
+    parser.add_argument('symbol')
+    parser.add_argument('timeframe')
+    parser.add_argument('start', help="e.g. 2022-01-01")
+    parser.add_argument('--end', default=None)
+    parser.add_argument('--workers', type=int, default=4)
+    args = parser.parse_args()
+    backfill_history(args.symbol, args.timeframe, args.start, args.end, max_workers=args.workers)
@@ -0,0 +1,88 @@
+class FeatureSpec:
+    """
+    One registered column.
+      inputs  - raw columns (open/high/low/close/volume) or other registered names
+      warmup  - rows this step itself needs before its value is usable
+                (an int, or a function of the build params)
+      compute - fn(data, **params) -> Series; `data` holds every input
+      column  - False for shared intermediates that are never returned
+    """
+    __slots__ = ('name', 'inputs', 'warmup', 'compute', 'column')
+
+    def __init__(self, name, inputs, warmup, compute, column):
+        self.name = name
+        self.inputs = tuple(inputs)
+        self.warmup = warmup
+        self.compute = compute
+        self.column = column
+
+    def own_warmup(self, params):
+        return self.warmup(params) if callable(self.warmup) else self.warmup
+
+
+class FeatureRegistry:
+    """
+    Every feature declares what it is built from, so a build only computes
+    the requested features plus their dependencies, and a shared
+    intermediate (e.g. the true range) is computed once per build.
+    New indicators plug in with @REGISTRY.register(...).
+    """
+    def __init__(self, raw_columns=('open', 'high', 'low', 'close', 'volume')):
+        self.raw_columns = tuple(raw_columns)
+        self.specs = {} # registration order = column order of a build
+
+    def register(self, name, inputs=(), warmup=0, column=True):
+        def decorator(fn):
+            for dependency in inputs:
+                if dependency not in self.raw_columns and dependency not in self.specs:
+                    raise KeyError(f"Feature '{name}' depends on unknown feature '{dependency}'")
+            self.specs[name] = FeatureSpec(name, inputs, warmup, fn, column)
+            return fn
+        return decorator
+
+    @property
+    def columns(self):
+        """Every public feature, in registration order."""
+        return [name for name, spec in self.specs.items() if spec.column]
+
+    def resolve(self, names):
+        """The requested features plus everything they depend on, dependencies first."""
+        order, seen = [], set()
+
+        def visit(name):
+            if name in seen or name in self.raw_columns:
+                return
+            if name not in self.specs:
+                raise KeyError(f"Unknown feature '{name}'")
+            seen.add(name)
+            for dependency in self.specs[name].inputs:
+                visit(dependency)
+            order.append(name)
+
+        for name in names:
+            visit(name)
+        return order
+
+    def warmup(self, names, **params):
+        """Rows before ALL of `names` are usable: the longest warm-up chain through the dependencies."""
+        total = {}
+        for name in self.resolve(names):
+            spec = self.specs[name]
+            total[name] = spec.own_warmup(params) + max((total.get(d, 0) for d in spec.inputs), default=0)
+        return max((total[name] for name in names), default=0)
+
+    def build(self, df, names, **params):
+        """
+        A copy of df with the requested feature columns added (in
+        registration order). Intermediates are computed but not returned.
+        """
+        data = {column: df[column] for column in self.raw_columns}
+        for name in self.resolve(names):
+            data[name] = self.specs[name].compute(data, **params)
+
+        out = df.copy()
+        wanted = set(names)
+        for name, spec in self.specs.items():
+            if name in wanted and spec.column:
+                out[name] = data[name]
+        return out
@@ -0,0 +1,274 @@
+import argparse
+import itertools
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+from sklearn.metrics import log_loss
+
+from backtester import get_start_idx, signals_from_probabilities, simulate, tested_bars
+from batch_training import cached_subset_probabilities
+from config import (RETRAIN_EVERY, DRIFT_THRESHOLD, ONLINE_LEARNING, SIGNAL_CACHE_DIR, SIGNAL_CACHE_MAX_MB,
+                    WALK_FORWARD_TRAIN, WALK_FORWARD_TEST)
+from model_manager import ModelManager
+from performance_metrics import evaluate_equity_curves
+from signal_cache import SignalCache
+from strategy import build_features
+from walk_forward import make_folds
+
+RESULTS_FILE = "feature_selection_results.csv"
+MODES = ('exhaustive', 'forward', 'backward', 'permutation', 'stability')
+
+
+def _model_params():
+    return dict(retrain_every=RETRAIN_EVERY, drift_threshold=DRIFT_THRESHOLD, online=ONLINE_LEARNING)
+
+
+def _score(row, objective):
+    """The objective as a comparable number (a NaN score never wins)."""
+    return float(np.nan_to_num(row[objective], nan=-np.inf))
+
+
+# --- SUBSET SCORES (the trading backtest, through the batched + cached model pass) ---
+
+def score_subsets(features, subsets, objective='sharpe', initial_balance=10000, workers=None):
+    """
+    Backtests every subset on the usual 80/20 split and returns one metrics
+    row per subset (evaluate_equity_curves columns + 'features').
+    All subsets share ONE batched model pass, and every subset's
+    probabilities land in the signal cache, so a subset that was scored
+    before (by any mode, or the tournament) costs milliseconds.
+    """
+    start_idx = get_start_idx(len(features))
+    prob_up, adx, skipped = cached_subset_probabilities(features, start_idx, subsets, features=features, workers=workers)
+    close = features['close'].to_numpy(dtype=np.float64)
+
+    curves, positions = [], []
+    for k in range(len(subsets)):
+        signals = signals_from_probabilities(prob_up[:, k], adx[:, k], skipped[:, k])
+        equity, switches = simulate(close, signals, start_idx, initial_balance)
+        equity, held = tested_bars(equity, switches, start_idx)
+        curves.append(equity)
+        positions.append(held)
+
+    scores = evaluate_equity_curves(np.column_stack(curves), np.column_stack(positions))
+    scores.insert(0, 'features', ["|".join(s) for s in subsets])
+    return scores.sort_values(objective, ascending=False, ignore_index=True)
+
+
+def exhaustive_selection(features, candidates, objective='sharpe', workers=None):
+    """Every non-empty subset, including the full set (2^N - 1 backtests)."""
+    subsets = [list(c) for r in range(1, len(candidates) + 1) for c in itertools.combinations(candidates, r)]
+    print(f"🏟️ Exhaustive: {len(subsets)} subsets")
+    scores = score_subsets(features, subsets, objective, workers=workers)
+    return scores['features'][0].split("|"), scores
+
+
+def forward_selection(features, candidates, objective='sharpe', max_features=None, min_gain=0.0, workers=None):
+    """
+    Greedy forward selection: start empty, add the candidate that improves
+    the objective most, stop when nothing improves it by more than min_gain.
+    Each step is one batched pass over the remaining candidates,
+    so the cost is about (selected size) x N backtests instead of 2^N.
+    """
+    max_features = max_features or len(candidates)
+    selected, best, history = [], -np.inf, []
+    while len(selected) < max_features:
+        remaining = [f for f in candidates if f not in selected]
+        if not remaining:
+            break
+        # Keep the candidate order, so the same subset always has the same cache key
+        subsets = [[f for f in candidates if f in selected or f == new] for new in remaining]
+        scores = score_subsets(features, subsets, objective, workers=workers)
+        history.append(scores.assign(step=len(history) + 1))
+        top = scores.iloc[0]
+        print(f"   ➕ step {len(history)}: {top['features']} {objective} {top[objective]:.3f}")
+        if _score(top, objective) <= best + min_gain:
+            break
+        selected, best = top['features'].split("|"), _score(top, objective)
+    return selected, pd.concat(history, ignore_index=True)
+
+
+def backward_selection(features, candidates, objective='sharpe', min_features=1, tolerance=0.0, workers=None):
+    """
+    Greedy backward elimination: start from the FULL set and drop the
+    feature whose removal scores best, as long as the objective doesn't
+    fall more than `tolerance` below the current one.
+    """
+    selected = list(candidates)
+    scores = score_subsets(features, [selected], objective, workers=workers)
+    best, history = _score(scores.iloc[0], objective), [scores.assign(step=0)]
+    while len(selected) > min_features:
+        subsets = [[f for f in selected if f != drop] for drop in selected]
+        scores = score_subsets(features, subsets, objective, workers=workers)
+        history.append(scores.assign(step=len(history)))
+        top = scores.iloc[0]
+        print(f"   ➖ step {len(history) - 1}: {top['features']} {objective} {top[objective]:.3f}")
+        if _score(top, objective) < best - tolerance:
+            break
+        selected, best = top['features'].split("|"), _score(top, objective)
+    return selected, pd.concat(history, ignore_index=True)
+
+
+# --- PERMUTATION IMPORTANCE PER WALK-FORWARD FOLD ---
+
+def _fold_importance(window, train_len, candidates, model_params, n_repeats, seed):
+    """
+    Worker: fits ONE model on the fold's train rows (every candidate feature)
+    and measures how much the test log-loss grows when each feature is
+    shuffled. Returns an (n_candidates,) array, mean over n_repeats; an
+    all-NaN array when the fold can't be fit.
+    """
+    window = window.replace([np.inf, -np.inf], np.nan) # e.g. volume_change after a zero-volume bar
+    train = window.iloc[:train_len].dropna(subset=candidates + ['target'])
+    test = window.iloc[train_len:].dropna(subset=candidates + ['target'])
+    importance = np.full(len(candidates), np.nan)
+    if len(train) < 30 or train['target'].nunique() < 2 or len(test) == 0:
+        return importance
+
+    model_manager = ModelManager(**model_params)
+    model_manager.fit(train[candidates].to_numpy(), train['target'].to_numpy(), candidates)
+    X, y = test[candidates].to_numpy(), test['target'].to_numpy()
+    base = log_loss(y, model_manager.predict_proba(X), labels=[0, 1])
+
+    rng = np.random.default_rng(seed)
+    for j in range(len(candidates)):
+        losses = []
+        for _ in range(n_repeats):
+            shuffled = X.copy()
+            shuffled[:, j] = rng.permutation(shuffled[:, j])
+            losses.append(log_loss(y, model_manager.predict_proba(shuffled), labels=[0, 1]))
+        importance[j] = np.mean(losses) - base
+    return importance
+
+
+def fold_importances(features, candidates, train_size=WALK_FORWARD_TRAIN, test_size=WALK_FORWARD_TEST,
+                     n_repeats=5, seed=42, workers=None, use_cache=True):
+    """
+    Permutation importance of every candidate on every walk-forward fold
+    (folds x candidates). One fit + N x n_repeats predictions per fold, so
+    the cost grows linearly with the number of candidates. Each fold's
+    result is kept in the signal cache.
+    """
+    folds = make_folds(len(features), train_size, test_size)
+    if not folds:
+        raise ValueError(f"Not enough data for walk-forward folds. Need more than {train_size + 1} rows.")
+    model_params = _model_params()
+    cache = SignalCache(SIGNAL_CACHE_DIR, max_bytes=SIGNAL_CACHE_MAX_MB * 1024 * 1024) if use_cache else None
+
+    windows = [features.iloc[train_start:test_end] for train_start, test_start, test_end in folds]
+    keys = [SignalCache.make_key(window, candidates, dict(model_params, kind='permutation_importance',
+                                                          train_len=test_start - train_start, n_repeats=n_repeats, seed=seed))
+            for window, (train_start, test_start, test_end) in zip(windows, folds)] if cache is not None else None
+
+    importances = [None] * len(folds)
+    todo = []
+    for n in range(len(folds)):
+        cached = cache.get(keys[n]) if cache is not None else None
+        if cached is None:
+            todo.append(n)
+        else:
+            importances[n] = cached['importance']
+    print(f"🔀 Permutation importance on {len(folds)} folds ({len(folds) - len(todo)} cached)")
+
+    if todo:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = pool.map(_fold_importance, [windows[n] for n in todo],
+                               [folds[n][1] - folds[n][0] for n in todo], [list(candidates)] * len(todo),
+                               [model_params] * len(todo), [n_repeats] * len(todo), [seed] * len(todo))
+            for n, importance in zip(todo, results):
+                importances[n] = importance
+                if cache is not None:
+                    cache.put(keys[n], importance=importance)
+    return np.vstack(importances)
+
+
+def importance_table(importances, candidates, top_k=None):
+    """
+    Per candidate: mean / std of its permutation importance over the folds,
+    and its selection frequency (share of folds where it is useful, i.e.
+    importance > 0, and in the fold's top_k when top_k is given).
+    """
+    valid = importances[~np.isnan(importances).all(axis=1)]
+    chosen = valid > 0
+    if top_k is not None:
+        ranks = (-valid).argsort(axis=1).argsort(axis=1)
+        chosen &= ranks < top_k
+    return pd.DataFrame({
+        'feature': candidates,
+        'importance_mean': valid.mean(axis=0),
+        'importance_std': valid.std(axis=0),
+        'selection_frequency': chosen.mean(axis=0),
+    }).sort_values(['selection_frequency', 'importance_mean'], ascending=False, ignore_index=True)
+
+
+def permutation_selection(features, candidates, objective='sharpe', workers=None, **kwargs):
+    """
+    Ranks the candidates by mean permutation importance over the folds and
+    backtests the N nested top-k sets (top 1, top 2, ... all) in one
+    batched pass. N backtests in total.
+    """
+    table = importance_table(fold_importances(features, candidates, workers=workers, **kwargs), candidates)
+    ranked = table.sort_values('importance_mean', ascending=False)['feature'].tolist()
+    print(table.to_string())
+    subsets = [[f for f in candidates if f in ranked[:k]] for k in range(1, len(ranked) + 1)]
+    scores = score_subsets(features, subsets, objective, workers=workers)
+    return scores['features'][0].split("|"), scores
+
+
+def stability_selection(features, candidates, objective='sharpe', threshold=0.6, top_k=None, workers=None, **kwargs):
+    """
+    Stability selection over walk-forward folds: keeps the features that are
+    useful (and in the top_k, if given) in at least `threshold` of the folds.
+    Favours features that help in every regime over ones that won one
+    lucky period. Only the selected set is backtested.
+    """
+    table = importance_table(fold_importances(features, candidates, workers=workers, **kwargs), candidates, top_k)
+    print(table.to_string())
+    selected = [f for f in candidates if f in set(table.loc[table['selection_frequency'] >= threshold, 'feature'])]
+    if not selected:
+        # Nothing is stable enough: fall back to the most stable feature
+        selected = [table['feature'][0]]
+    scores = score_subsets(features, [selected], objective, workers=workers)
+    return selected, scores
+
+
+def run_feature_selection(df, candidates, mode='forward', objective='sharpe', log_file=RESULTS_FILE, workers=None, **kwargs):
+    """
+    Fast alternative to the exhaustive tournament. Every mode returns the
+    selected features and writes the subsets it backtested (with their
+    metrics) to log_file.
+      exhaustive  - all 2^N - 1 subsets
+      forward     - greedy forward selection (about k x N backtests)
+      backward    - greedy backward elimination from the full set
+      permutation - N nested sets ranked by walk-forward permutation importance
+      stability   - the features that are useful in most walk-forward folds
+    """
+    selectors = {'exhaustive': exhaustive_selection, 'forward': forward_selection, 'backward': backward_selection,
+                 'permutation': permutation_selection, 'stability': stability_selection}
+    features = build_features(df)
+    print(f"🎯 Feature selection ({mode}) over {len(candidates)} candidates...")
+    selected, scores = selectors[mode](features, list(candidates), objective=objective, workers=workers, **kwargs)
+    scores.to_csv(log_file, index=False)
+    print(f"🏆 Selected: {selected}")
+    print(f"💾 Backtested subsets in {log_file}")
+    return selected
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Pick the model's features without trying every combination.")
+    parser.add_argument('--mode', choices=MODES, default='forward')
+    parser.add_argument('--data', default="btc_hourly.csv")
+    parser.add_argument('--features', nargs='+', default=['returns', 'range', 'rsi', 'volatility', 'adx',
+                                                          'volume_change', 'dist_from_mean', 'relative_volume'])
+    parser.add_argument('--objective', default='sharpe')
+    parser.add_argument('--results', default=RESULTS_FILE)
+    parser.add_argument('--workers', type=int, default=None)
+    args = parser.parse_args()
+
+    df = pd.read_csv(args.data, parse_dates=['ts'])
+    run_feature_selection(df, args.features, args.mode, args.objective, args.results, args.workers)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+import cProfile
+import datetime
+import functools
+import inspect
+import io
+import json
+import pstats
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+
+from config import METRICS_FILE, PROFILE
+
+
+class PipelineMetrics:
+    """
+    Wall time + call counts per pipeline stage
+    (data_fetch, feature_build, model_fit, predict, order_submission, report).
+
+    Wrap work in `with metrics.stage("model_fit"):`. The live loop calls
+    end_cycle() once per candle, which appends one JSON line with that
+    cycle's timings to the metrics file. summary() has the totals for the
+    whole run.
+    """
+    def __init__(self, path=METRICS_FILE):
+        self.path = path
+        self.totals = defaultdict(float)
+        self.counts = defaultdict(int)
+        self.cycle_times = defaultdict(float)
+        self.cycle_index = 0
+
+    @contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            self.totals[name] += elapsed
+            self.counts[name] += 1
+            self.cycle_times[name] += elapsed
+
+    def timed(self, name):
+        """Decorator version of stage() (works for plain and async functions)."""
+        def decorator(fn):
+            if inspect.iscoroutinefunction(fn):
+                @functools.wraps(fn)
+                async def async_wrapper(*args, **kwargs):
+                    with self.stage(name):
+                        return await fn(*args, **kwargs)
+                return async_wrapper
+
+            @functools.wraps(fn)
+            def wrapper(*args, **kwargs):
+                with self.stage(name):
+                    return fn(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def end_cycle(self, **extra):
+        """Writes this cycle's stage timings as one JSON line and starts a new cycle."""
+        self.cycle_index += 1
+        record = {
+            'cycle': self.cycle_index,
+            'time': datetime.datetime.now(datetime.timezone.utc).isoformat(),
+            'stages': {name: round(seconds, 6) for name, seconds in self.cycle_times.items()},
+            **extra,
+        }
+        self.cycle_times = defaultdict(float)
+        if self.path:
+            with open(self.path, 'a') as f:
+                f.write(json.dumps(record, default=str) + "\n")
+        return record
+
+    def summary(self):
+        return {
+            name: {
+                'total_s': round(self.totals[name], 6),
+                'calls': self.counts[name],
+                'mean_s': round(self.totals[name] / self.counts[name], 6),
+            }
+            for name in sorted(self.totals, key=self.totals.get, reverse=True)
+        }
+
+    def write_summary(self):
+        """End-of-run summary: printed, and appended to the metrics file as a 'summary' line."""
+        summary = self.summary()
+        print("\n--- ⏱️ Pipeline Timing Summary ---")
+        for name, stats in summary.items():
+            print(f"{name:<18} {stats['total_s']:>10.3f}s  {stats['calls']:>7} calls  {stats['mean_s'] * 1000:>9.2f}ms avg")
+        if self.path:
+            with open(self.path, 'a') as f:
+                f.write(json.dumps({'summary': summary, 'time': datetime.datetime.now(datetime.timezone.utc).isoformat()}) + "\n")
+        return summary
+
+
+# One shared instance per process
+metrics = PipelineMetrics()
+
+
+@contextmanager
+def maybe_profile(name, top=25):
+    """
+    Opt-in cProfile (PROFILE=true in .env). Saves <name>.prof (open it with
+    snakeviz / pstats) and prints the top functions by cumulative time.
+    Does nothing when profiling is off.
+    """
+    if not PROFILE:
+        yield
+        return
+
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield
+    finally:
+        profiler.disable()
+        profiler.dump_stats(f"{name}.prof")
+        out = io.StringIO()
+        pstats.Stats(profiler, stream=out).sort_stats('cumulative').print_stats(top)
+        print(out.getvalue())
+        print(f"🧵 Profile saved to {name}.prof")
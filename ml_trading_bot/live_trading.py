@@ -1,12 +1,19 @@
 import time
 import pandas as pd
 from datetime import datetime, timedelta
-from strategy import generate_signal
+from strategy import training_rows, signal_from_model, min_rows
+from streaming_indicators import FeatureWindow
 # Import your existing tools
-from data_loader import get_exchange, get_historical_data 
-from config import SYMBOL, TIMEFRAME
+from data_loader import get_exchange, update_store
+from config import SYMBOL, TIMEFRAME, RETRAIN_EVERY, DRIFT_THRESHOLD, ONLINE_LEARNING
 import logging
 from risk_manager import RiskManager
+from model_manager import ModelManager
+from model_store import ModelStore
+from training_worker import TrainingWorker
+from instrumentation import metrics
+from bar_store import BarStore
+from trading_state import PositionState
 
 
 
@@ -23,9 +30,12 @@ def get_quote_currency(symbol):
     """
     return symbol.split('/')[1]
 
-def execute_ccxt_trade(exchange, signal, symbol):
+@metrics.timed("order_submission")
+def execute_ccxt_trade(exchange, signal, symbol, budget=None):
     """
     Executes trades using the CCXT library (same as your data loader).
+    budget caps how much cash a BUY may use (portfolio mode shares one
+    cash balance between symbols). None = all free cash.
     """
     base = get_base_currency(symbol) # e.g., BTC
     quote = get_quote_currency(symbol) # e.g., USD
@@ -58,6 +68,8 @@ def execute_ccxt_trade(exchange, signal, symbol):
     if signal == "BUY":
         try:
             # Calculate how much to buy. We use 95% of cash to save room for fees.
+            if budget is not None:
+                usd_free = min(usd_free, budget)
             if usd_free > 10.0: # Minimum 10 USD to trade
                 # We need the current price to calculate amount
                 ticker = exchange.fetch_ticker(symbol)
@@ -98,18 +110,27 @@ def run_live_bot(active_features):
         return
     rm.set_daily_baseline(bal)
 
-    last_Four_positions = ["HOLD","HOLD","HOLD","HOLD"]
-    switch_counter=0
-    hold_counter = 0
-    
+    # Streaming indicators: each new candle updates RSI/ADX/rolling stats in O(1)
+    # instead of recomputing all 300 rows every hour
+    feature_window = FeatureWindow(maxlen=300)
+
+    # Cached model: refit every RETRAIN_EVERY candles instead of every hour.
+    # Warm start from the last saved artifact, so a restart can predict without fitting first.
+    model_store = ModelStore()
+    model_manager = ModelManager(retrain_every=RETRAIN_EVERY, drift_threshold=DRIFT_THRESHOLD, online=ONLINE_LEARNING)
+    model_manager = model_store.load_latest(SYMBOL, TIMEFRAME, active_features, feature_window.rows.maxlen,
+                                            params=model_manager.params()) or model_manager
+    # Training runs in the background between candles; the candle close only predicts
+    worker = TrainingWorker(model_manager, model_store, store_key=(SYMBOL, TIMEFRAME, feature_window.rows.maxlen))
+
+    store = BarStore()
+
     # Track "Logical" position (what the bot thinks it is doing)
     # logic: if we have crypto > dust, we are "BUY", else "HOLD"
     balance = exchange.fetch_balance()
     base = get_base_currency(SYMBOL)
-    if balance.get('total', {}).get(base, 0) > 0.0001:
-        current_position = "BUY"
-    else:
-        current_position = "HOLD"
+    # n-Signal Confirmation (3 chosen here but easily extendable down back to two or back up to 4)
+    state = PositionState("BUY" if balance.get('total', {}).get(base, 0) > 0.0001 else "HOLD", "HOLD", confirmations=3)
 
     while True:
         try:
@@ -130,56 +151,48 @@ def run_live_bot(active_features):
             time.sleep(wait_seconds)
 
             # 3. GET DATA (Using your data_loader)
-            # We fetch 300 rows to ensure indicators have enough warmup data
             print("📥 Fetching live data...")
-            df = get_historical_data(SYMBOL, TIMEFRAME, target_rows=300)
-            
-            # Data loader returns 'ts' column, we might need to ensure column names match strategy
-            # Your data_loader returns: ['ts', 'open', 'high', 'low', 'close', 'volume']
-            # This is perfectly compatible with the strategy.
-    
-
-            # 4. GET SIGNAL
-            raw_signal = generate_signal(df, active_features)
+            update_store(SYMBOL, TIMEFRAME, store=store, exchange=exchange)
+
+            # Only candles we haven't seen yet are read back and go through the
+            # streaming indicators (the very first cycle warms them up on the
+            # newest 300 rows, enough warmup for the indicators).
+            new_candles = feature_window.update_from_store(store, SYMBOL, TIMEFRAME)
+            print(f"🧮 Updated features with {new_candles} new candle(s)")
+
+            # 4. GET SIGNAL (predict only, with the newest background-trained model)
+            frame = feature_window.to_frame() if len(feature_window.rows) >= min_rows(active_features) else None
+            rows = training_rows(frame, active_features) if frame is not None else None
+            trained_now = False
+            if rows is None:
+                raw_signal = "HOLD"
+            else:
+                if not worker.ready():
+                    # Nothing to warm-start from: the very first model is fit right here
+                    worker.train_now(*rows, active_features)
+                    trained_now = True
+                raw_signal = signal_from_model(frame, active_features, worker.model_manager)
             print(f"🔮 Raw Signal: {raw_signal}")
 
             # 5. BUFFER LOGIC (n-Signal Confirmation)
-            #(3 chosen here but easily extendable down back to two or back up to 4)
-            if raw_signal != "HOLD":
-                hold_counter = 0
-                last_Four_positions[3]=last_Four_positions[2]
-                last_Four_positions[2]=last_Four_positions[1]
-                last_Four_positions[1]=last_Four_positions[0]
-                last_Four_positions[0]=raw_signal
-                if raw_signal!= current_position:
-                    switch_counter +=1 
-                else:
-                    switch_counter =0 
-            else:
-                hold_counter +=1
-                if hold_counter == 4:
-                    switch_counter=0
-                    
-                last_Four_positions[3]=last_Four_positions[2]
-                last_Four_positions[2]=last_Four_positions[1]
-                last_Four_positions[1]=last_Four_positions[0]
-
-            confirmed_signal = current_position
-            if switch_counter==3:
-                confirmed_signal= raw_signal
-                switch_counter = 0
-                hold_counter = 0
-
-            print(f"🛡️ Confirmed: {confirmed_signal} | Current Logical Pos: {current_position}")
+            current_position = state.position
+            switched = state.update(raw_signal)
+            print(f"🛡️ Confirmed: {state.position} | Current Logical Pos: {current_position}")
 
             # 6. EXECUTE
-            if confirmed_signal != current_position:
-                print(f"⚡ SWITCHING: {current_position} -> {confirmed_signal}")
-                execute_ccxt_trade(exchange, confirmed_signal, SYMBOL)
-                current_position = confirmed_signal
+            if switched:
+                print(f"⚡ SWITCHING: {current_position} -> {state.position}")
+                execute_ccxt_trade(exchange, state.position, SYMBOL)
             else:
                 print("💤 No trade required.")
 
+            # 7. TRAIN the next model in the background while we wait for the next candle
+            if rows is not None and not trained_now:
+                worker.submit(*rows, active_features)
+
+            # One JSON line per cycle: was it Alpaca latency or model training?
+            metrics.end_cycle(signal=raw_signal, position=state.position)
+
         except Exception as e:
             print(f"⚠️ Loop Error: {e}")
             time.sleep(60) # Wait 1 min before retrying
\ No newline at end of file
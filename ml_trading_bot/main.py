@@ -1,6 +1,6 @@
 import time
 import os
-from config import SYMBOL, TIMEFRAME, get_exchange, API_KEY, SECRET_KEY
+from config import SYMBOL, SYMBOLS, TIMEFRAME, get_exchange, API_KEY, SECRET_KEY
 from data_loader import get_historical_data
 from strategy import generate_signal
 # Top of main.py
@@ -10,12 +10,28 @@ from backtester import run_backtest
 import logging
 import itertools
 import csv
+import atexit
 import pandas  as pd
 from live_trading import run_live_bot
+from parallel_tournament import run_parallel_tournament
+from async_live_trading import run_live_bot_async
+from stream_ingest import run_streaming_bot
+import asyncio
+from instrumentation import metrics, maybe_profile
+from portfolio import fetch_portfolio_data, run_portfolio_backtest, run_portfolio_live_bot
+from walk_forward import run_walk_forward
+from feature_selection import run_feature_selection
 
 # --- SETTINGS ---
 BACKTESTING = True  # <--- TOGGLE THIS: True = Lab Mode, False = Real Money
 TOURNAMENT_BACKTEST = False
+PARALLEL_TOURNAMENT = True # Spread the tournament combos over all CPU cores
+TOURNAMENT_WORKERS = None  # None = os.cpu_count()
+FEATURE_SELECTION = "exhaustive" # exhaustive | forward | backward | permutation | stability (see feature_selection.py)
+ASYNC_LIVE = True # asyncio live engine (concurrent fetches, order polling)
+STREAMING_LIVE = False # With ASYNC_LIVE: decide at the exact candle close from a trade stream (see stream_ingest.py)
+PORTFOLIO_MODE = False # Trade / backtest every symbol in SYMBOLS from this one process
+WALK_FORWARD = False # Rolling train/test folds over the whole history instead of one 80/20 split
 DATA_FILE = "btc_hourly.csv" # Your historical data file
 
 # The features you found were "Best" (Update this list based on your findings)
@@ -40,15 +56,24 @@ def run_feature_tournament():
                     'dist_from_mean',
                     'relative_volume'
                 ]
-    print("🏟️ Starting Feature Tournament...")
     log_file = "backtest_results.csv"
 
+    if FEATURE_SELECTION != "exhaustive":
+        run_feature_selection(df, potential_features, FEATURE_SELECTION, workers=TOURNAMENT_WORKERS)
+        return
+
+    if PARALLEL_TOURNAMENT:
+        run_parallel_tournament(df, potential_features, log_file=log_file, workers=TOURNAMENT_WORKERS)
+        return
+
+    print("🏟️ Starting Feature Tournament...")
+
     # 2. Prepare the CSV file and write the header
     with open(log_file, mode='w', newline='') as f:
         writer = csv.writer(f)
         writer.writerow(['Combination_Size', 'Features', 'Sharpe_Ratio', 'max Drawdown','Total_Return_Pct'])
         
-        for r in range(1,len(potential_features)):
+        for r in range(1, len(potential_features) + 1):
             for combo in itertools.combinations(potential_features, r):
                 combo_list = list(combo)
                 print(f"🧪 Testing Combo: {combo_list}")
@@ -59,29 +84,51 @@ def run_feature_tournament():
 
 # --- MAIN EXECUTION ---
 if __name__ == "__main__":
-    if BACKTESTING:
-        print("🧪 RUNNING IN BACKTEST MODE")
-        
-        # OPTION A: Run the Tournament to find best features
-        if TOURNAMENT_BACKTEST:
-            run_feature_tournament() 
-        else:
-            # OPTION B: Run a single backtest with your best features
-            df = get_historical_data(SYMBOL, TIMEFRAME)
+    # Per-stage timing summary on exit (also after Ctrl+C). PROFILE=true adds cProfile.
+    atexit.register(metrics.write_summary)
+
+    with maybe_profile("backtest" if BACKTESTING else "live"):
+        if BACKTESTING:
+            print("🧪 RUNNING IN BACKTEST MODE")
         
-            while df is None:
-                logging.info("SLEEPING: Waiting for data availability...")
-                time.sleep(60)
+            # OPTION A: Run the Tournament to find best features
+            if TOURNAMENT_BACKTEST:
+                run_feature_tournament() 
+            elif PORTFOLIO_MODE:
+                print(f"Running portfolio test on {SYMBOLS} with: {BEST_FEATURES}")
+                run_portfolio_backtest(fetch_portfolio_data(SYMBOLS, TIMEFRAME), active_features=BEST_FEATURES)
+            elif WALK_FORWARD:
                 df = get_historical_data(SYMBOL, TIMEFRAME)
-            print(f"Running single test with: {BEST_FEATURES}")
-            history = run_backtest(df, active_features=BEST_FEATURES)
-            print(f"🏁 Final Balance: ${history[-1]:.2f}")
+                while df is None:
+                    logging.info("SLEEPING: Waiting for data availability...")
+                    time.sleep(60)
+                    df = get_historical_data(SYMBOL, TIMEFRAME)
+                print(f"Running walk-forward test with: {BEST_FEATURES}")
+                run_walk_forward(df, active_features=BEST_FEATURES)
+            else:
+                # OPTION B: Run a single backtest with your best features
+                df = get_historical_data(SYMBOL, TIMEFRAME)
+        
+                while df is None:
+                    logging.info("SLEEPING: Waiting for data availability...")
+                    time.sleep(60)
+                    df = get_historical_data(SYMBOL, TIMEFRAME)
+                print(f"Running single test with: {BEST_FEATURES}")
+                history = run_backtest(df, active_features=BEST_FEATURES)
+                print(f"🏁 Final Balance: ${history[-1]:.2f}")
         
-    else:
-        print("⚠️ RUNNING IN LIVE PAPER TRADING MODb")
-        print("Press Ctrl+C to stop.")
-        # Passes the winning features to the live bot
-        run_live_bot(active_features=BEST_FEATURES)
+        else:
+            print("⚠️ RUNNING IN LIVE PAPER TRADING MODb")
+            print("Press Ctrl+C to stop.")
+            # Passes the winning features to the live bot
+            if PORTFOLIO_MODE:
+                run_portfolio_live_bot(active_features=BEST_FEATURES, symbols=SYMBOLS)
+            elif ASYNC_LIVE and STREAMING_LIVE:
+                asyncio.run(run_streaming_bot(active_features=BEST_FEATURES))
+            elif ASYNC_LIVE:
+                asyncio.run(run_live_bot_async(active_features=BEST_FEATURES))
+            else:
+                run_live_bot(active_features=BEST_FEATURES)
 
 
 
@@ -0,0 +1,107 @@
+import asyncio
+import itertools
+
+import ccxt
+import pandas as pd
+
+
+class MockExchange:
+    """
+    Offline stand-in for ccxt.async_support.alpaca, for testing the async
+    live engine without keys or network.
+
+    It replays a candle DataFrame (e.g. btc_hourly.csv). Only the first
+    `cursor` candles are "published", and advance() reveals the next one.
+    Market orders fill at the last published close after fill_delay seconds,
+    and latency is added to every call to mimic a real API.
+    """
+    parse_timeframe = staticmethod(ccxt.Exchange.parse_timeframe)
+
+    def __init__(self, df, symbol="BTC/USD", timeframe="1h", cursor=300, usd=10000.0, latency=0.05, fill_delay=0.2, fee_pct=0.001):
+        self.df = df.reset_index(drop=True)
+        self.symbol = symbol
+        self.cursor = cursor
+        self.latency = latency
+        self.fill_delay = fill_delay
+        self.fee_pct = fee_pct
+
+        base, quote = symbol.split('/')
+        self.balances = {quote: float(usd), base: 0.0}
+        self.orders = {}
+        self._order_ids = itertools.count(1)
+        self._ts_ms = (pd.to_datetime(self.df['ts']).astype('datetime64[ms]').astype('int64')).tolist()
+        self._timeframe_ms = self.parse_timeframe(timeframe) * 1000
+
+    async def _call(self):
+        await asyncio.sleep(self.latency)
+
+    def milliseconds(self):
+        """The mock's clock: the close time of the newest published candle."""
+        return self._ts_ms[self.cursor - 1] + self._timeframe_ms
+
+    def advance(self, n=1):
+        """Publishes the next n candles."""
+        self.cursor = min(self.cursor + n, len(self.df))
+
+    def last_price(self):
+        return float(self.df['close'].iloc[self.cursor - 1])
+
+    async def fetch_ohlcv(self, symbol, timeframe, since=None, limit=1000):
+        await self._call()
+        rows = []
+        for i in range(self.cursor):
+            if since is not None and self._ts_ms[i] < since:
+                continue
+            row = self.df.iloc[i]
+            rows.append([self._ts_ms[i], row['open'], row['high'], row['low'], row['close'], row['volume']])
+            if len(rows) == limit:
+                break
+        return rows
+
+    async def fetch_balance(self):
+        await self._call()
+        balance = {'free': dict(self.balances), 'total': dict(self.balances)}
+        for currency, amount in self.balances.items():
+            balance[currency] = {'free': amount, 'total': amount}
+        return balance
+
+    async def fetch_ticker(self, symbol):
+        await self._call()
+        return {'symbol': symbol, 'last': self.last_price()}
+
+    async def _create_market_order(self, symbol, side, amount):
+        await self._call()
+        order_id = str(next(self._order_ids))
+        order = {'id': order_id, 'symbol': symbol, 'side': side, 'amount': amount,
+                 'status': 'open', 'filled': 0.0, 'cost': 0.0}
+        self.orders[order_id] = order
+        asyncio.get_running_loop().call_later(self.fill_delay, self._fill, order_id)
+        return dict(order)
+
+    def _fill(self, order_id):
+        order = self.orders[order_id]
+        base, quote = order['symbol'].split('/')
+        price = self.last_price()
+        cost = order['amount'] * price
+        fee = cost * self.fee_pct
+        if order['side'] == 'buy':
+            self.balances[quote] -= cost + fee
+            self.balances[base] += order['amount']
+        else:
+            self.balances[base] -= order['amount']
+            self.balances[quote] += cost - fee
+        order.update(status='closed', filled=order['amount'], cost=cost, average=price,
+                     fee={'cost': fee, 'currency': quote})
+
+    async def create_market_buy_order(self, symbol, amount):
+        return await self._create_market_order(symbol, 'buy', amount)
+
+    async def create_market_sell_order(self, symbol, amount):
+        return await self._create_market_order(symbol, 'sell', amount)
+
+    async def fetch_order(self, order_id, symbol=None):
+        await self._call()
+        return dict(self.orders[order_id])
+
+    async def close(self):
+        pass
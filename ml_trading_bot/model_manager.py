@@ -0,0 +1,124 @@
+import numpy as np
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.linear_model import SGDClassifier
+from sklearn.preprocessing import StandardScaler
+
+from instrumentation import metrics
+
+
+class ModelManager:
+    """
+    Keeps ONE fitted model alive between bars instead of building a new
+    RandomForest on every generate_signal call.
+
+    The model is refit when:
+      - there is no model yet, or the feature list changed
+      - retrain_every bars have passed since the last fit
+      - the feature distribution drifted more than drift_threshold
+        (average |z-score| of the window mean vs. the training data)
+    Between refits, predictions come from the cached model.
+    With online=True an SGD logistic model is used instead, and it is
+    updated with partial_fit on every new labelled bar.
+    """
+    def __init__(self, retrain_every=24, drift_threshold=None, online=False,
+                 n_estimators=100, max_depth=5, random_state=42):
+        self.retrain_every = retrain_every
+        self.drift_threshold = drift_threshold
+        self.online = online
+        self.n_estimators = n_estimators
+        self.max_depth = max_depth
+        self.random_state = random_state
+
+        self.model = None
+        self.scaler = None
+        self.features = None
+        self.bars_since_fit = 0
+        self.fit_count = 0
+        self.train_mean = None
+        self.train_std = None
+
+    def params(self):
+        """The settings that decide what the model predicts (used as a cache key)."""
+        return {
+            'retrain_every': self.retrain_every,
+            'drift_threshold': self.drift_threshold,
+            'online': self.online,
+            'n_estimators': self.n_estimators,
+            'max_depth': self.max_depth,
+            'random_state': self.random_state,
+        }
+
+    def _new_model(self):
+        if self.online:
+            return SGDClassifier(loss='log_loss', random_state=self.random_state)
+        return RandomForestClassifier(n_estimators=self.n_estimators, max_depth=self.max_depth,
+                                      random_state=self.random_state)
+
+    def drift_score(self, X):
+        """Average absolute z-score of the window mean vs. the training mean."""
+        if self.train_mean is None:
+            return 0.0
+        z = (np.nanmean(np.asarray(X, dtype=np.float64), axis=0) - self.train_mean) / (self.train_std + 1e-9)
+        return float(np.nanmean(np.abs(z)))
+
+    def needs_retrain(self, X, features):
+        if self.model is None or self.features != list(features):
+            return True
+        if self.bars_since_fit >= self.retrain_every:
+            return True
+        if self.drift_threshold is not None and self.drift_score(X) > self.drift_threshold:
+            return True
+        return False
+
+    def update_due(self, X, features):
+        """Whether prepare() on the next bar would change the model (a refit, or the online update)."""
+        if self.online:
+            return True
+        # prepare() counts the bar before it checks
+        self.bars_since_fit += 1
+        try:
+            return self.needs_retrain(X, features)
+        finally:
+            self.bars_since_fit -= 1
+
+    @metrics.timed("model_fit")
+    def fit(self, X, y, features):
+        self.model = self._new_model()
+        if self.online:
+            self.scaler = StandardScaler().fit(X)
+            self.model.partial_fit(self.scaler.transform(X), y, classes=[0, 1])
+        else:
+            self.model.fit(X, y)
+
+        self.features = list(features)
+        self.bars_since_fit = 0
+        self.fit_count += 1
+        # np.asarray: X may be a DataFrame or a plain array (batch_training)
+        values = np.asarray(X, dtype=np.float64)
+        self.train_mean = np.nanmean(values, axis=0)
+        self.train_std = np.nanstd(values, axis=0, ddof=1)
+
+    @metrics.timed("model_partial_fit")
+    def partial_update(self, X_new, y_new):
+        """Online update with the newest labelled rows (SGD only)."""
+        self.scaler.partial_fit(X_new)
+        self.model.partial_fit(self.scaler.transform(X_new), y_new)
+
+    def prepare(self, X, y, features):
+        """
+        Makes sure the model is ready for this bar and returns the manager,
+        which predicts like a normal sklearn model.
+        X / y are the labelled training rows (the newest labelled row last).
+        """
+        self.bars_since_fit += 1
+        if self.needs_retrain(X, features):
+            self.fit(X, y, features)
+        elif self.online:
+            self.partial_update(X.iloc[[-1]], y.iloc[[-1]])
+        return self
+
+    def predict_proba(self, X):
+        """Same interface as the sklearn model (handles the online scaler)."""
+        if self.online:
+            X = self.scaler.transform(X)
+        return self.model.predict_proba(X)
@@ -0,0 +1,108 @@
+import datetime
+import glob
+import json
+import os
+import re
+
+import joblib
+import sklearn
+
+from config import MODEL_DIR, MODEL_KEEP_VERSIONS
+
+
+class ModelStore:
+    """
+    Versioned ModelManager artifacts on disk, keyed by symbol + timeframe +
+    feature list + training window, so a restarted bot can predict right away
+    instead of fitting a forest first.
+
+    Layout: <root>/<SYMBOL>_<TIMEFRAME>/<features>_w<window>/model_v0001.joblib
+    Every artifact has a .json next to it (params, fit count, sklearn version).
+    The arrays are saved uncompressed, so load() can memory-map them.
+    Only the newest `keep` versions are kept.
+    """
+    def __init__(self, root=MODEL_DIR, keep=MODEL_KEEP_VERSIONS):
+        self.root = root
+        self.keep = keep
+
+    def _dir(self, symbol, timeframe, features, window):
+        return os.path.join(self.root, f"{symbol.replace('/', '_')}_{timeframe}", f"{'-'.join(features)}_w{window}")
+
+    def versions(self, symbol, timeframe, features, window):
+        """Saved version numbers, oldest first."""
+        paths = glob.glob(os.path.join(self._dir(symbol, timeframe, features, window), "model_v*.joblib"))
+        return sorted(int(re.search(r"model_v(\d+)\.joblib$", p).group(1)) for p in paths)
+
+    def save(self, model_manager, symbol, timeframe, window):
+        """Writes the next version and returns its path."""
+        directory = self._dir(symbol, timeframe, model_manager.features, window)
+        os.makedirs(directory, exist_ok=True)
+        versions = self.versions(symbol, timeframe, model_manager.features, window)
+        version = versions[-1] + 1 if versions else 1
+
+        path = os.path.join(directory, f"model_v{version:04d}.joblib")
+        meta_path = path.replace(".joblib", ".json")
+        # Temp file + rename for both files, metadata FIRST: the .joblib is what makes
+        # a version visible, so a crash never leaves a "latest" without its metadata
+        with open(meta_path + ".tmp", 'w') as f:
+            json.dump({
+                'version': version,
+                'saved_at': datetime.datetime.now(datetime.timezone.utc).isoformat(),
+                'symbol': symbol,
+                'timeframe': timeframe,
+                'features': model_manager.features,
+                'window': window,
+                'params': model_manager.params(),
+                'fit_count': model_manager.fit_count,
+                'sklearn': sklearn.__version__,
+            }, f, indent=2)
+        os.replace(meta_path + ".tmp", meta_path)
+        joblib.dump(model_manager, path + ".tmp")
+        os.replace(path + ".tmp", path)
+
+        for old in versions[:max(0, len(versions) + 1 - self.keep)]:
+            for ext in (".joblib", ".json"):
+                try:
+                    os.remove(os.path.join(directory, f"model_v{old:04d}{ext}"))
+                except FileNotFoundError:
+                    pass
+        return path
+
+    def load_latest(self, symbol, timeframe, features, window, params=None):
+        """
+        The newest USABLE artifact as a ready-to-predict ModelManager. A version
+        with missing / broken metadata, other model params or another
+        scikit-learn version is skipped for the one before it; None when no
+        version fits.
+        """
+        for version in reversed(self.versions(symbol, timeframe, features, window)):
+            model_manager = self._load(symbol, timeframe, features, window, version, params)
+            if model_manager is not None:
+                return model_manager
+        return None
+
+    def _load(self, symbol, timeframe, features, window, version, params):
+        path = os.path.join(self._dir(symbol, timeframe, features, window), f"model_v{version:04d}.joblib")
+        try:
+            with open(path.replace(".joblib", ".json")) as f:
+                meta = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            print(f"⚠️ Model artifact v{version} has no readable metadata, skipping it.")
+            return None
+
+        if meta.get('sklearn') != sklearn.__version__:
+            print(f"⚠️ Model artifact v{version} was saved with scikit-learn {meta.get('sklearn')}, skipping it.")
+            return None
+        if params is not None and meta.get('params') != params:
+            print(f"⚠️ Model artifact v{version} has other model params, skipping it.")
+            return None
+
+        # The forest's arrays are memory-mapped read-only. The online SGD model
+        # updates its weights in place, so that one is loaded into memory.
+        try:
+            model_manager = joblib.load(path, mmap_mode=None if meta['params'].get('online') else 'r')
+        except Exception as e:
+            print(f"⚠️ Model artifact v{version} can't be loaded ({e}), skipping it.")
+            return None
+        print(f"📦 Loaded model v{version} ({meta['saved_at']}) for {symbol} {features}")
+        return model_manager
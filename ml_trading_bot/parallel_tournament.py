@@ -0,0 +1,152 @@
+import csv
+import itertools
+import os
+import tempfile
+from multiprocessing import Pool
+
+import numpy as np
+import pandas as pd
+
+from backtester import get_start_idx, backtest_equity, equity_from_probabilities, tested_bars, plot_results
+from batch_training import cached_subset_probabilities
+from performance_metrics import evaluate_equity_curves
+from strategy import build_features
+
+# Filled in once per worker process by _init_worker
+_worker_data = {}
+
+METRIC_COLUMNS = ['sharpe', 'max_drawdown_pct', 'total_return_pct', 'sortino', 'calmar',
+                  'rolling_sharpe_min', 'max_drawdown_duration', 'turnover', 'exposure']
+
+
+def _init_worker(matrix_path, ts_path, columns, plot=True, use_cache=True):
+    """
+    Runs once in every worker process.
+    Opens the feature matrix as a READ-ONLY memory map, so all workers share
+    the same pages from the OS cache instead of each getting a pickled copy.
+    """
+    matrix = np.load(matrix_path, mmap_mode='r')
+    ts = np.load(ts_path, mmap_mode='r')
+
+    features = pd.DataFrame(matrix, columns=columns, copy=False)
+    features['ts'] = pd.to_datetime(ts)
+    _worker_data['features'] = features
+    _worker_data['plot'] = plot
+    _worker_data['use_cache'] = use_cache
+
+
+def _run_combo(combo):
+    """
+    Backtests one feature combination inside a worker.
+    Returns the tested bars' equity + positions; the parent scores them in batches.
+    """
+    features = _worker_data['features']
+    combo_list = list(combo)
+    print(f"🧪 Testing Combo: {combo_list}")
+    result = backtest_equity(features, active_features=combo_list, features=features, use_cache=_worker_data['use_cache'])
+    if result is None:
+        return combo_list, None, None
+    equity_series, switches = result
+    if _worker_data['plot']:
+        plot_results(equity_series, combo_list)
+    return (combo_list, *tested_bars(equity_series.to_numpy(), switches, get_start_idx(len(features))))
+
+
+def _write_scored(writer, finished):
+    """Scores a batch of finished combos in ONE vectorized call and writes their rows."""
+    equity = np.column_stack([equity for _, equity, _ in finished])
+    positions = np.column_stack([positions for _, _, positions in finished])
+    scores = evaluate_equity_curves(equity, positions)
+    for (combo_list, _, _), row in zip(finished, scores[METRIC_COLUMNS].to_numpy()):
+        writer.writerow([len(combo_list), "|".join(combo_list)] + [round(float(v), 4) for v in row])
+
+
+def _batched_combos(features, combos, workers, plot=True, use_cache=True):
+    """
+    Every combo's model pass in ONE batched call (batch_training), then only
+    the cheap rules + simulation per combo. Yields the same tuples as _run_combo.
+    """
+    start_idx = get_start_idx(len(features))
+    if len(features) < 50 or start_idx >= len(features) - 1:
+        print(f"Error: Not enough data to backtest. Need more than {start_idx + 1} rows.")
+        return
+    prob_up, adx, skipped = cached_subset_probabilities(features, start_idx, combos, features=features, workers=workers,
+                                                        use_cache=use_cache)
+    for k, combo in enumerate(combos):
+        combo_list = list(combo)
+        print(f"🧪 Testing Combo: {combo_list}")
+        result = equity_from_probabilities(features, start_idx, prob_up[:, k], adx[:, k], skipped[:, k])
+        if result is None:
+            yield combo_list, None, None
+            continue
+        equity_series, switches = result
+        if plot:
+            plot_results(equity_series, combo_list)
+        yield (combo_list, *tested_bars(equity_series.to_numpy(), switches, start_idx))
+
+
+def _write_results(writer, f, results, batch_size):
+    """Streams results to the CSV as they finish, scoring them batch_size at a time."""
+    finished = []
+    for combo_list, equity, positions in results:
+        if equity is None:
+            print(f"⚠️ No report for {combo_list}")
+            continue
+        finished.append((combo_list, equity, positions))
+        if len(finished) == batch_size:
+            _write_scored(writer, finished)
+            f.flush()
+            finished = []
+    if finished:
+        _write_scored(writer, finished)
+
+
+def run_parallel_tournament(df, potential_features, log_file="backtest_results.csv", workers=None, batch_size=32, batched=True,
+                            plot=True, use_cache=True):
+    """
+    Same tournament as main.run_feature_tournament, but every combination runs
+    in a process pool. Finished combos are scored batch_size at a time with the
+    vectorized metrics engine and written to the CSV right away (so a crash
+    halfway still leaves you with the finished rows). All metrics are numeric.
+    batched=True trains every combo in one batched pass (one worker per
+    combo on a shared feature matrix, predictions grouped between refits);
+    batched=False runs a full backtest_equity per combo.
+    plot=False skips the per-combo PNGs, use_cache=False the signal cache (benchmark.py).
+    """
+    workers = workers or os.cpu_count()
+
+    # 1. Build the feature matrix ONCE in the parent process
+    features = build_features(df)
+
+    combos = [
+        combo
+        for r in range(1, len(potential_features) + 1) # up to and including the full set
+        for combo in itertools.combinations(potential_features, r)
+    ]
+    print(f"🏟️ Starting Parallel Feature Tournament: {len(combos)} combos on {workers} workers...")
+
+    with open(log_file, mode='w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['Combination_Size', 'Features', 'Sharpe_Ratio', 'max Drawdown','Total_Return_Pct',
+                         'Sortino_Ratio', 'Calmar_Ratio', 'Rolling_Sharpe_Min', 'Max_Drawdown_Bars', 'Turnover', 'Exposure'])
+        f.flush()
+
+        if batched:
+            _write_results(writer, f, _batched_combos(features, combos, workers, plot, use_cache), batch_size)
+        else:
+            columns = [c for c in features.columns if c != 'ts']
+            matrix = features[columns].to_numpy(dtype=np.float64)
+            ts = features['ts'].to_numpy(dtype='datetime64[ns]')
+            with tempfile.TemporaryDirectory() as tmp_dir:
+                # 2. Dump the arrays to disk so workers can memory-map them
+                matrix_path = os.path.join(tmp_dir, "features.npy")
+                ts_path = os.path.join(tmp_dir, "ts.npy")
+                np.save(matrix_path, matrix)
+                np.save(ts_path, ts)
+
+                # 3. Stream results as combos finish, scoring them in batches
+                with Pool(processes=workers, initializer=_init_worker,
+                          initargs=(matrix_path, ts_path, columns, plot, use_cache)) as pool:
+                    _write_results(writer, f, pool.imap_unordered(_run_combo, combos), batch_size)
+
+    print(f"🏁 Tournament finished. Results in {log_file}")
@@ -0,0 +1,231 @@
+import argparse
+import itertools
+import json
+import math
+import os
+import random
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+import pandas as pd
+
+from backtester import get_start_idx, cached_probabilities, signals_from_probabilities, simulate, tested_bars
+from config import RETRAIN_EVERY, DRIFT_THRESHOLD, ONLINE_LEARNING
+from model_manager import ModelManager
+from performance_metrics import evaluate_equity_curves
+
+RESULTS_FILE = "param_search_results.jsonl"
+
+SEARCH_SPACE = {
+    'adx_threshold': [15, 20, 25, 30, 35],
+    'confidence': [0.55, 0.60, 0.65, 0.70],
+    'confirmations': [1, 2, 3, 4, 5],
+    'ma_window': [10, 20, 30, 50],
+    'volume_window': [12, 24, 48],
+    'n_estimators': [50, 100, 200],
+    'max_depth': [3, 5, 8],
+}
+
+# Changing one of these needs a new model pass. The rest (adx_threshold,
+# confidence, confirmations) only re-applies the rules to the same probabilities.
+MODEL_PARAMS = ('ma_window', 'volume_window', 'n_estimators', 'max_depth')
+
+# Filled in once per worker process by _init_worker
+_worker_data = {}
+
+
+def grid_trials(space=SEARCH_SPACE):
+    names = list(space)
+    return [dict(zip(names, values)) for values in itertools.product(*space.values())]
+
+
+def random_trials(n_trials, space=SEARCH_SPACE, seed=42):
+    """n_trials distinct random points of the grid (same seed = same trials)."""
+    rng = random.Random(seed)
+    n_trials = min(n_trials, math.prod(len(values) for values in space.values()))
+    trials, seen = [], set()
+    while len(trials) < n_trials:
+        trial = {name: rng.choice(values) for name, values in space.items()}
+        key = trial_key(trial)
+        if key not in seen:
+            seen.add(key)
+            trials.append(trial)
+    return trials
+
+
+def trial_key(params, test_bars=None):
+    return json.dumps({'params': params, 'test_bars': test_bars}, sort_keys=True)
+
+
+# --- PERSISTENCE (one JSON line per finished trial, so a search can be resumed) ---
+
+def load_results(path=RESULTS_FILE):
+    results = {}
+    if not os.path.exists(path):
+        return results
+    with open(path) as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue # A run killed mid-write leaves half a line
+            results[trial_key(record['params'], record['test_bars'])] = record
+    return results
+
+
+def append_results(records, path=RESULTS_FILE):
+    with open(path, 'a') as f:
+        for record in records:
+            f.write(json.dumps(record) + "\n")
+
+
+# --- WORKERS ---
+
+def _init_worker(df, active_features):
+    _worker_data['df'] = df
+    _worker_data['active_features'] = active_features
+
+
+def model_probabilities(df, active_features, model_params, start_idx):
+    """
+    The expensive half of a trial: features + walk-forward model pass.
+    Stored in the signal cache, so every trial (and every later search or
+    run_backtest) with the same model settings reuses it.
+    """
+    model_manager = ModelManager(retrain_every=RETRAIN_EVERY, drift_threshold=DRIFT_THRESHOLD, online=ONLINE_LEARNING,
+                                 n_estimators=model_params['n_estimators'], max_depth=model_params['max_depth'])
+    return cached_probabilities(df, start_idx, active_features, model_manager,
+                                ma_window=model_params['ma_window'], volume_window=model_params['volume_window'])
+
+
+def _run_group(model_params, trials, start_idx, initial_balance):
+    """
+    Worker: every trial that shares one set of model params.
+    ONE model pass, then only the cheap rules + simulation per trial,
+    and all of the group's equity curves are scored in one vectorized call.
+    """
+    df = _worker_data['df']
+    prob_up, adx, skipped = model_probabilities(df, _worker_data['active_features'], model_params, start_idx)
+    close = df['close'].to_numpy(dtype=np.float64)
+
+    curves, positions = [], []
+    for params in trials:
+        signals = signals_from_probabilities(prob_up, adx, skipped, params['adx_threshold'], params['confidence'])
+        equity, switches = simulate(close, signals, start_idx, initial_balance, confirmations=params['confirmations'])
+        equity, held = tested_bars(equity, switches, start_idx)
+        curves.append(equity)
+        positions.append(held)
+
+    scores = evaluate_equity_curves(np.column_stack(curves), np.column_stack(positions))
+    return [
+        {'params': params, 'test_bars': len(close) - 1 - start_idx, 'metrics': {k: float(v) for k, v in row.items()}}
+        for params, (_, row) in zip(trials, scores.iterrows())
+    ]
+
+
+# --- SEARCH ---
+
+def run_search(df, trials, active_features, test_bars=None, initial_balance=10000,
+               results_path=RESULTS_FILE, workers=None, objective='sharpe'):
+    """
+    Evaluates every trial on the last test_bars bars (default: the same
+    80/20 split as run_backtest). Trials are grouped by their model params,
+    and each group runs in a worker process. Finished trials are appended
+    to results_path as they come in; trials already in that file are not
+    run again, so an interrupted search picks up where it stopped.
+    Returns a DataFrame of the trials, best objective first.
+    """
+    start_idx = get_start_idx(len(df)) if test_bars is None else len(df) - 1 - test_bars
+    test_bars = len(df) - 1 - start_idx
+
+    done = load_results(results_path)
+    pending = [t for t in trials if trial_key(t, test_bars) not in done]
+
+    groups = defaultdict(list)
+    for trial in pending:
+        groups[tuple(trial[name] for name in MODEL_PARAMS)].append(trial)
+
+    print(f"🔍 {len(trials)} trials on {test_bars} bars: {len(trials) - len(pending)} already done, "
+          f"{len(pending)} to run in {len(groups)} model groups")
+
+    if groups:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(df, active_features)) as pool:
+            futures = [pool.submit(_run_group, dict(zip(MODEL_PARAMS, key)), group, start_idx, initial_balance)
+                       for key, group in groups.items()]
+            for n, future in enumerate(as_completed(futures), start=1):
+                records = future.result()
+                append_results(records, results_path)
+                for record in records:
+                    done[trial_key(record['params'], test_bars)] = record
+                best = max(records, key=lambda r: r['metrics'][objective])
+                print(f"   ✅ group {n}/{len(groups)} | best {objective} {best['metrics'][objective]:.3f}")
+
+    rows = [dict(done[trial_key(t, test_bars)]['params'], test_bars=test_bars, **done[trial_key(t, test_bars)]['metrics'])
+            for t in trials]
+    return pd.DataFrame(rows).sort_values(objective, ascending=False, ignore_index=True)
+
+
+def successive_halving(df, trials, active_features, min_bars=100, max_bars=None, eta=3, **kwargs):
+    """
+    Early stopping for bad trials: every trial is first scored on a short
+    recent slice (min_bars test bars), only the best 1/eta survive to a
+    slice eta times longer, and so on up to max_bars (default: every bar
+    after the first 100).
+    Every rung runs its own model pass from its own start (a standalone
+    backtest of that slice, cached per start). Computing the probabilities
+    once at max_bars would make every first-rung trial pay for the longest
+    pass, which costs more than retraining the few survivors.
+    """
+    objective = kwargs.get('objective', 'sharpe')
+    max_bars = max_bars or len(df) - 1 - 100
+
+    budgets = [max_bars]
+    while budgets[0] // eta >= min_bars:
+        budgets.insert(0, budgets[0] // eta)
+
+    survivors = trials
+    for rung, budget in enumerate(budgets, start=1):
+        print(f"🪜 Rung {rung}/{len(budgets)}: {len(survivors)} trials")
+        ranked = run_search(df, survivors, active_features, test_bars=budget, **kwargs)
+        if rung < len(budgets):
+            keep = max(1, math.ceil(len(survivors) / eta))
+            # .item(): back to plain Python numbers so the trial keys match
+            survivors = [{name: getattr(row[name], 'item', lambda: row[name])() for name in SEARCH_SPACE}
+                         for row in ranked.head(keep).to_dict('records')]
+    return ranked
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Search the strategy thresholds and model settings.")
+    parser.add_argument('--mode', choices=['grid', 'random', 'halving'], default='random')
+    parser.add_argument('--trials', type=int, default=200, help="Number of random trials (random / halving)")
+    parser.add_argument('--data', default="btc_hourly.csv")
+    parser.add_argument('--features', nargs='+', default=["returns", "rsi", "adx", "dist_from_mean"])
+    parser.add_argument('--test-bars', type=int, default=None)
+    parser.add_argument('--objective', default='sharpe')
+    parser.add_argument('--results', default=RESULTS_FILE)
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    df = pd.read_csv(args.data, parse_dates=['ts'])
+    kwargs = dict(results_path=args.results, workers=args.workers, objective=args.objective)
+    if args.mode == 'grid':
+        ranked = run_search(df, grid_trials(), args.features, test_bars=args.test_bars, **kwargs)
+    elif args.mode == 'random':
+        ranked = run_search(df, random_trials(args.trials, seed=args.seed), args.features, test_bars=args.test_bars, **kwargs)
+    else:
+        ranked = successive_halving(df, random_trials(args.trials, seed=args.seed), args.features,
+                                    max_bars=args.test_bars, **kwargs)
+
+    print("\n--- 🏆 Top 10 ---")
+    print(ranked.head(10).to_string())
+    print(f"💾 All trials in {args.results}")
+
+
+if __name__ == "__main__":
+    main()
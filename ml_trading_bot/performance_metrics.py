@@ -50,4 +50,102 @@ def generate_report(equity_curve):
         "Sharpe Ratio": sharpe,
         "Max Drawdown": f"{mdd}%",
         "Total Return": f"{round(total_return, 2)}%"
-    }
\ No newline at end of file
+    }
+
+
+# --- VECTORIZED METRICS ENGINE ---
+# Scores MANY equity curves at once: a 2-D array with one column per strategy
+# variant (e.g. every tournament combo). All numbers stay numeric.
+
+def rolling_sharpe(equity, window=168, risk_free_rate=0.0, periods_per_year=365):
+    """
+    Annualized Sharpe over a sliding window of `window` returns, for every
+    column at once (cumulative sums, no Python loop).
+    Returns an array of shape (n_returns - window + 1, n_curves).
+    """
+    equity = np.asarray(equity, dtype=np.float64)
+    if equity.ndim == 1:
+        equity = equity[:, None]
+    excess = equity[1:] / equity[:-1] - 1 - risk_free_rate / periods_per_year
+    if len(excess) < window:
+        return np.empty((0, equity.shape[1]))
+
+    zeros = np.zeros((1, equity.shape[1]))
+    sums = np.concatenate([zeros, np.cumsum(excess, axis=0)])
+    squares = np.concatenate([zeros, np.cumsum(excess ** 2, axis=0)])
+    window_sum = sums[window:] - sums[:-window]
+    window_sq = squares[window:] - squares[:-window]
+
+    mean = window_sum / window
+    var = np.maximum(window_sq - window * mean ** 2, 0) / (window - 1)
+    std = np.sqrt(var)
+    # Same convention as calculate_sharpe_ratio: a flat window scores 0
+    sharpe = np.divide(mean, std, out=np.zeros_like(mean), where=std > 1e-12)
+    return sharpe * np.sqrt(periods_per_year)
+
+
+def evaluate_equity_curves(equity, positions=None, names=None, risk_free_rate=0.0, periods_per_year=365, rolling_window=168):
+    """
+    Args:
+        equity (array): shape (n_bars, n_curves), or 1-D for a single curve.
+        positions (array): optional, same shape, the position held after each
+            bar (-1 / 0 / 1). Needed for turnover and exposure (NaN otherwise).
+        names (list): row labels for the result (e.g. the feature combos).
+    Returns a DataFrame with one row per curve and numeric columns:
+        sharpe, sortino, calmar, total_return_pct, max_drawdown_pct,
+        max_drawdown_duration (bars), rolling_sharpe_min, turnover
+        (position units traded per bar) and exposure (share of bars in a trade).
+    """
+    equity = np.asarray(equity, dtype=np.float64)
+    if equity.ndim == 1:
+        equity = equity[:, None]
+    n_bars, n_curves = equity.shape
+    zeros = np.zeros(n_curves)
+
+    # 1. Return based ratios
+    excess = equity[1:] / equity[:-1] - 1 - risk_free_rate / periods_per_year
+    mean = excess.mean(axis=0)
+    std = excess.std(axis=0, ddof=1) if n_bars > 2 else zeros
+    downside = np.sqrt(np.mean(np.minimum(excess, 0) ** 2, axis=0))
+    sharpe = np.divide(mean, std, out=zeros.copy(), where=std > 1e-12) * np.sqrt(periods_per_year)
+    sortino = np.divide(mean, downside, out=zeros.copy(), where=downside > 1e-12) * np.sqrt(periods_per_year)
+
+    # 2. Drawdowns
+    peak = np.maximum.accumulate(equity, axis=0)
+    drawdown = equity / peak - 1
+    max_drawdown = drawdown.min(axis=0)
+    # Longest stretch under water: bars since the last peak, maxed per column
+    bars = np.arange(n_bars)[:, None]
+    last_peak = np.maximum.accumulate(np.where(drawdown >= 0, bars, 0), axis=0)
+    max_dd_duration = (bars - last_peak).max(axis=0)
+
+    # 3. Calmar = annualized return / |max drawdown|
+    growth = equity[-1] / equity[0]
+    years = max(n_bars - 1, 1) / periods_per_year
+    annual_return = growth ** (1 / years) - 1
+    calmar = np.divide(annual_return, -max_drawdown, out=zeros.copy(), where=max_drawdown < 0)
+
+    rolling = rolling_sharpe(equity, rolling_window, risk_free_rate, periods_per_year)
+    rolling_min = rolling.min(axis=0) if len(rolling) else np.full(n_curves, np.nan)
+
+    # 4. Trading activity
+    if positions is not None:
+        positions = np.asarray(positions, dtype=np.float64)
+        if positions.ndim == 1:
+            positions = positions[:, None]
+        turnover = np.abs(np.diff(positions, axis=0)).sum(axis=0) / n_bars
+        exposure = (positions != 0).mean(axis=0)
+    else:
+        turnover = exposure = np.full(n_curves, np.nan)
+
+    return pd.DataFrame({
+        'sharpe': sharpe,
+        'sortino': sortino,
+        'calmar': calmar,
+        'total_return_pct': (growth - 1) * 100,
+        'max_drawdown_pct': max_drawdown * 100,
+        'max_drawdown_duration': max_dd_duration,
+        'rolling_sharpe_min': rolling_min,
+        'turnover': turnover,
+        'exposure': exposure,
+    }, index=names)
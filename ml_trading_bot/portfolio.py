@@ -0,0 +1,196 @@
+import time
+import logging
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+from backtester import get_start_idx, generate_signals, simulate, plot_results
+from config import SYMBOLS, TIMEFRAME, RETRAIN_EVERY, DRIFT_THRESHOLD, ONLINE_LEARNING
+from bar_store import BarStore
+from data_loader import get_exchange, get_historical_data, update_store
+from live_trading import execute_ccxt_trade, get_base_currency, get_quote_currency
+from async_live_trading import get_coin_value
+from model_manager import ModelManager
+from model_store import ModelStore
+from instrumentation import metrics
+from performance_metrics import generate_report
+from risk_manager import RiskManager
+from strategy import build_features, generate_signal_from_features, min_rows
+from streaming_indicators import FeatureWindow
+from trading_state import PositionState
+
+
+def fetch_portfolio_data(symbols, timeframe, target_rows=1000, exchange=None):
+    """
+    Fetches every symbol over ONE exchange session (one set of keys,
+    one rate limiter) instead of one process / session per symbol.
+    ccxt has no multi-symbol OHLCV call for Alpaca, so the per-symbol
+    requests run side by side in threads.
+    """
+    exchange = exchange or get_exchange()
+    with ThreadPoolExecutor(max_workers=len(symbols)) as pool:
+        frames = pool.map(lambda s: get_historical_data(s, timeframe, target_rows=target_rows, exchange=exchange), symbols)
+    return dict(zip(symbols, frames))
+
+
+# --- BACKTEST ---
+
+def _symbol_signals(df, active_features):
+    """Worker: features + walk-forward model pass for one symbol."""
+    start_idx = get_start_idx(len(df))
+    model_manager = ModelManager(retrain_every=RETRAIN_EVERY, drift_threshold=DRIFT_THRESHOLD, online=ONLINE_LEARNING)
+    return start_idx, generate_signals(build_features(df), start_idx, active_features, model_manager)
+
+
+def run_portfolio_backtest(dfs, initial_balance=10000, active_features=['returns', 'rsi', 'adx', 'dist_from_mean'], workers=None):
+    """
+    Backtests several symbols from one process.
+    The model work runs per symbol in parallel worker processes. The capital
+    is ONE shared budget: RiskManager.allocate gives each symbol an equal
+    slice, and the portfolio equity is the sum of the slices.
+    """
+    dfs = {s: df for s, df in dfs.items() if df is not None and len(df) > get_start_idx(len(df)) + 1}
+    if not dfs:
+        print("Error: Not enough data to backtest any symbol.")
+        return None
+
+    rm = RiskManager()
+    budget = rm.allocate(initial_balance, len(dfs))
+    print(f"Running Portfolio Backtest on {list(dfs)} (${budget:.2f} each)...")
+
+    symbols = list(dfs)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        results = list(pool.map(_symbol_signals, [dfs[s] for s in symbols], [active_features] * len(symbols)))
+
+    curves = {}
+    for symbol, (start_idx, signals) in zip(symbols, results):
+        df = dfs[symbol]
+        equity, switches = simulate(df['close'].to_numpy(dtype=np.float64), signals, start_idx, budget)
+        print(f"   {symbol}: {len(switches)} switches, final ${equity[-1]:.2f}")
+        ts = df['ts'].to_numpy()
+        dates = np.concatenate([ts[:start_idx], ts[start_idx + 1:]])
+        curves[symbol] = pd.Series(equity, index=pd.to_datetime(dates))
+
+    # Align the symbols on one clock; a symbol without a bar keeps its last value
+    aligned = pd.DataFrame(curves).sort_index().ffill().bfill()
+    equity_series = aligned.sum(axis=1)
+
+    report = generate_report(equity_series)
+    print("\n--- Portfolio Performance Report ---")
+    for k, v in report.items():
+        print(f"{k}: {v}")
+    print("------------------------------------------")
+
+    plot_results(equity_series, ["portfolio"] + [s.replace('/', '') for s in symbols])
+    return report
+
+
+# --- LIVE ---
+
+def _symbol_live_signal(frame, active_features, model_manager):
+    """Worker thread: one symbol's signal. The model manager is updated in place."""
+    if len(frame) < min_rows(active_features):
+        return "HOLD"
+    return generate_signal_from_features(frame, active_features, model_manager=model_manager)
+
+
+def get_portfolio_equity(exchange, balance, symbols):
+    """
+    Total equity of the portfolio: the quote cash (counted once) plus every
+    symbol's coins at the last price. The circuit breaker watches this, so
+    spending cash on a buy doesn't look like a loss.
+    """
+    with ThreadPoolExecutor(max_workers=len(symbols)) as pool:
+        tickers = dict(zip(symbols, pool.map(exchange.fetch_ticker, symbols)))
+    cash = balance.get('total', {}).get(get_quote_currency(symbols[0]), 0)
+    return cash + sum(get_coin_value(balance, tickers[s], get_base_currency(s)) for s in symbols)
+
+
+def run_portfolio_live_bot(active_features, symbols=SYMBOLS, workers=None):
+    """
+    run_live_bot for several symbols in ONE process: one exchange session,
+    one balance fetch per cycle (plus one after each trade, so the next
+    symbol's budget sees the cash that is left), one RiskManager (shared
+    circuit breaker and cash budget), and per-symbol models computed in
+    parallel threads (the managers never get pickled, and the fit
+    timings land in this process's metrics).
+    """
+    logging.info(f"🤖 Starting Portfolio ML Trading Bot for {symbols}...")
+    exchange = get_exchange()
+    rm = RiskManager(risk_per_trade=0.02)
+
+    try:
+        balance = exchange.fetch_balance()
+        logging.info(f"connected to Alpaca. Balance: ${balance['free']['USD']:.2f}")
+        rm.set_daily_baseline(get_portfolio_equity(exchange, balance, symbols))
+    except Exception as e:
+        logging.error(f"Auth Error: Check .env keys. {e}")
+        return
+
+    windows = {s: FeatureWindow(maxlen=300) for s in symbols}
+    # Warm start every symbol from its last saved model artifact
+    model_store = ModelStore()
+    managers = {}
+    for s in symbols:
+        fresh = ModelManager(retrain_every=RETRAIN_EVERY, drift_threshold=DRIFT_THRESHOLD, online=ONLINE_LEARNING)
+        managers[s] = model_store.load_latest(s, TIMEFRAME, active_features, windows[s].rows.maxlen, params=fresh.params()) or fresh
+    saved_fits = {s: m.fit_count for s, m in managers.items()}
+    states = {}
+    for s in symbols:
+        held = balance.get('total', {}).get(get_base_currency(s), 0) > 0.0001
+        states[s] = PositionState("BUY" if held else "HOLD", "HOLD", confirmations=3)
+    store = BarStore()
+
+    with ThreadPoolExecutor(max_workers=workers or len(symbols)) as pool:
+        while True:
+            try:
+                # 1. WAIT FOR NEXT CANDLE
+                now = datetime.now()
+                next_hour = (now + timedelta(hours=1)).replace(minute=0, second=0, microsecond=0)
+                wait_seconds = (next_hour - now).total_seconds() + 10 # 10s buffer
+                print(f"⏳ Waiting {int(wait_seconds // 60)}m {int(wait_seconds % 60)}s for candle close...")
+                time.sleep(wait_seconds)
+
+                # 2. GET DATA for every symbol over the shared session (only the new candles are read back)
+                with ThreadPoolExecutor(max_workers=len(symbols)) as fetch_pool:
+                    list(fetch_pool.map(lambda s: update_store(s, TIMEFRAME, store, exchange), symbols))
+                for s in symbols:
+                    windows[s].update_from_store(store, s, TIMEFRAME)
+
+                # The cycle's one balance fetch, for the circuit breaker and the cash budget
+                balance = exchange.fetch_balance()
+                if rm.check_circuit_breaker(get_portfolio_equity(exchange, balance, symbols)):
+                    logging.critical(" CIRCUIT BREAKER TRIGGERED! Max daily loss exceeded. Halting.")
+                    break
+
+                # 3. SIGNALS: one thread per symbol
+                futures = {s: pool.submit(_symbol_live_signal, windows[s].to_frame(), active_features, managers[s])
+                           for s in symbols if windows[s].rows}
+                raw_signals = {s: future.result() for s, future in futures.items()}
+                print(f"🔮 Raw Signals: {raw_signals}")
+
+                # 4. BUFFER LOGIC + EXECUTION per symbol, sharing one cash budget
+                quote = get_quote_currency(symbols[0])
+                for s, raw_signal in raw_signals.items():
+                    state = states[s]
+                    old_position = state.position
+                    open_slots = sum(1 for st in states.values() if st.position != "BUY")
+                    if state.update(raw_signal):
+                        budget = rm.allocate(balance[quote]['free'], open_slots)
+                        print(f"⚡ {s} SWITCHING: {old_position} -> {state.position}")
+                        execute_ccxt_trade(exchange, state.position, s, budget=budget)
+                        balance = exchange.fetch_balance()
+
+                metrics.end_cycle(signals=raw_signals)
+
+                # 5. SAVE the models that were refit this cycle
+                for s, model_manager in managers.items():
+                    if model_manager.fit_count != saved_fits[s]:
+                        model_store.save(model_manager, s, TIMEFRAME, windows[s].rows.maxlen)
+                        saved_fits[s] = model_manager.fit_count
+
+            except Exception as e:
+                print(f"⚠️ Loop Error: {e}")
+                time.sleep(60) # Wait 1 min before retrying
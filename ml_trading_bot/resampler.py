@@ -0,0 +1,116 @@
+import os
+import shutil
+
+import ccxt
+import numpy as np
+import pandas as pd
+
+from bar_store import BarStore, COLUMNS
+
+
+def aggregate(data, timeframe_ms):
+    """
+    Groups base bars ({column: array}, 'ts' int64 ms, sorted) into candles
+    of timeframe_ms, aligned to the epoch like the exchange's candles.
+    Returns the aggregated {column: array}, one row per bucket that has data.
+    """
+    ts = data['ts']
+    if len(ts) == 0:
+        return {column: data[column][:0] for column in COLUMNS}
+    bucket = ts - ts % timeframe_ms
+    starts = np.flatnonzero(np.r_[True, bucket[1:] != bucket[:-1]])
+    ends = np.r_[starts[1:], len(ts)] - 1
+    return {
+        'ts': bucket[starts],
+        'open': data['open'][starts],
+        'high': np.maximum.reduceat(data['high'], starts),
+        'low': np.minimum.reduceat(data['low'], starts),
+        'close': data['close'][ends],
+        'volume': np.add.reduceat(data['volume'], starts),
+    }
+
+
+class Resampler:
+    """
+    Serves any higher timeframe (5m, 15m, 1h, 4h, 1d, ...) out of ONE
+    base-resolution series in the BarStore (e.g. 1m bars).
+    Closed derived candles are cached in their own BarStore under
+    <store root>/derived, so update() only aggregates the base bars since
+    the last cached candle: the newest (still forming) derived candle is
+    the only one that is recomputed as base bars arrive.
+    Timeframes are aligned to the epoch (UTC midnight for 1d), and must be
+    a whole multiple of the base timeframe.
+    """
+    def __init__(self, store=None, base_timeframe='1m', cache=None):
+        self.store = store or BarStore()
+        self.base_timeframe = base_timeframe
+        self.base_ms = ccxt.Exchange.parse_timeframe(base_timeframe) * 1000
+        self.cache = cache or BarStore(os.path.join(self.store.root, "derived"))
+        self.forming = {} # (symbol, timeframe) -> the newest, not yet closed candle (or None)
+
+    def _timeframe_ms(self, timeframe):
+        timeframe_ms = ccxt.Exchange.parse_timeframe(timeframe) * 1000
+        if timeframe_ms < self.base_ms or timeframe_ms % self.base_ms:
+            raise ValueError(f"Can't build {timeframe} candles out of {self.base_timeframe} bars")
+        return timeframe_ms
+
+    def update(self, symbol, timeframe):
+        """
+        Aggregates the base bars that came in since the last call. Closed
+        candles are appended to the cache, the forming one is kept in
+        self.forming. Returns how many candles were closed.
+        """
+        timeframe_ms = self._timeframe_ms(timeframe)
+        if timeframe_ms == self.base_ms:
+            return 0
+
+        # 1. Only the base bars after the newest cached candle
+        last_cached = self.cache.last_timestamp(symbol, timeframe)
+        start = None if last_cached is None else pd.Timestamp(last_cached + timeframe_ms, unit='ms')
+        base = self.store.read_arrays(symbol, self.base_timeframe, start=start)
+        if len(base['ts']) == 0:
+            self.forming[(symbol, timeframe)] = None
+            return 0
+
+        # 2. A candle is closed once the base bars reach its end
+        candles = aggregate(base, timeframe_ms)
+        covered_until = base['ts'][-1] + self.base_ms
+        closed = candles['ts'] + timeframe_ms <= covered_until
+        rows = np.column_stack([candles[column].astype(np.float64) for column in COLUMNS])
+
+        added = self.cache.append(symbol, timeframe, rows[closed])
+        self.forming[(symbol, timeframe)] = None if closed[-1] else rows[-1].tolist()
+        return added
+
+    def read_arrays(self, symbol, timeframe, last_n=None, include_forming=False, update=True):
+        """
+        {column: array} like BarStore.read_arrays. include_forming adds the
+        candle that is still building up (its values change until it closes).
+        """
+        if self._timeframe_ms(timeframe) == self.base_ms:
+            return self.store.read_arrays(symbol, timeframe, last_n=last_n)
+        if update:
+            self.update(symbol, timeframe)
+
+        forming = self.forming.get((symbol, timeframe)) if include_forming else None
+        data = self.cache.read_arrays(symbol, timeframe, last_n=None if last_n is None else last_n - (forming is not None))
+        if forming is not None:
+            data = {column: np.append(data[column], np.asarray(forming[i], dtype=data[column].dtype))
+                    for i, column in enumerate(COLUMNS)}
+        return data
+
+    def read(self, symbol, timeframe, last_n=None, include_forming=False, update=True):
+        """Same DataFrame layout as BarStore.read / get_historical_data."""
+        data = self.read_arrays(symbol, timeframe, last_n, include_forming, update)
+        data['ts'] = pd.to_datetime(data['ts'], unit='ms')
+        return pd.DataFrame(data)
+
+    def rebuild(self, symbol, timeframe):
+        """
+        Drops the cached candles and builds them again from the base bars.
+        Needed after older base bars were merged in (backfill_history),
+        since the cache only ever moves forward.
+        """
+        shutil.rmtree(self.cache._dir(symbol, timeframe), ignore_errors=True)
+        self.forming.pop((symbol, timeframe), None)
+        return self.update(symbol, timeframe)
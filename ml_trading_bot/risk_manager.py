@@ -27,6 +27,15 @@ class RiskManager:
         return False
     
     
+    def allocate(self, cash, open_slots):
+        """
+        Shared risk budget for portfolio mode: splits the free cash evenly
+        between the symbols that don't hold a position yet.
+        """
+        if open_slots <= 0:
+            return 0.0
+        return cash / open_slots
+
     def calculate_position_size(self, balance, current_price, atr=None):
         """
         Calculates how much to buy. 
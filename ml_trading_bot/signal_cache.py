@@ -0,0 +1,82 @@
+import hashlib
+import json
+import os
+import tempfile
+
+import numpy as np
+
+# Bump this when the strategy/feature code changes, so old entries stop matching
+CACHE_VERSION = 2 # 2: entries hold the per-bar probabilities instead of signals
+
+
+class SignalCache:
+    """
+    Persistent cache for the walk-forward signal pass.
+
+    The model pass is deterministic (random_state=42), so the same bars +
+    feature list + model settings always give the same per-bar probabilities. Entries are
+    .npz files named by a SHA-256 of those inputs. Every hit refreshes the
+    file's mtime, and when the folder grows past max_bytes the least recently
+    used files are deleted.
+    """
+    def __init__(self, directory="data/signal_cache", max_bytes=500 * 1024 * 1024):
+        self.directory = directory
+        self.max_bytes = max_bytes
+
+    @staticmethod
+    def make_key(df, active_features, params):
+        """Content hash of the OHLCV bars, the feature tuple and the model/window parameters."""
+        h = hashlib.sha256()
+        h.update(np.ascontiguousarray(df['ts'].to_numpy(dtype='datetime64[ns]').view(np.int64)).tobytes())
+        h.update(np.ascontiguousarray(df[['open', 'high', 'low', 'close', 'volume']].to_numpy(dtype=np.float64)).tobytes())
+        h.update(json.dumps({
+            'version': CACHE_VERSION,
+            'features': list(active_features),
+            'params': params,
+        }, sort_keys=True, default=str).encode())
+        return h.hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.directory, f"{key}.npz")
+
+    def get(self, key):
+        """Returns a dict of arrays, or None on a miss."""
+        path = self._path(key)
+        try:
+            with np.load(path) as data:
+                arrays = {name: data[name] for name in data.files}
+            os.utime(path) # LRU: mark as recently used
+            return arrays
+        except (FileNotFoundError, OSError, ValueError):
+            return None
+
+    def put(self, key, **arrays):
+        os.makedirs(self.directory, exist_ok=True)
+        # Write to a temp file and rename, so parallel workers never read half a file
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        with os.fdopen(fd, 'wb') as f:
+            np.savez(f, **arrays)
+        os.replace(tmp_path, self._path(key))
+        self.evict()
+
+    def evict(self):
+        """Deletes least-recently-used entries until the cache fits in max_bytes."""
+        entries = []
+        for name in os.listdir(self.directory):
+            if not name.endswith(".npz"):
+                continue
+            try:
+                stat = os.stat(os.path.join(self.directory, name))
+            except FileNotFoundError:
+                continue # Another worker evicted it already
+            entries.append((stat.st_mtime, stat.st_size, name))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, name in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(os.path.join(self.directory, name))
+            except FileNotFoundError:
+                pass
+            total -= size
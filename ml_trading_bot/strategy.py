@@ -2,6 +2,10 @@ import pandas as pd
 import numpy as np
 from sklearn.ensemble import RandomForestClassifier
 import matplotlib.pyplot as plt
+from instrumentation import metrics
+from feature_registry import FeatureRegistry
+import adx_kernel
+
 def calculate_rsi(series, window=14):
     delta = series.diff()
     gain = (delta.where(delta > 0, 0)).rolling(window=window).mean()
@@ -15,6 +19,18 @@ def calculate_adx(df, window=14):
     ADX measures trend STRENGTH, not direction.
     ADX > 25 usually implies a strong trend.
     ADX < 25 usually implies a ranging market.
+    Runs on the NumPy arrays (adx_kernel), no DataFrame copy.
+    """
+    values, _ = adx_kernel.adx(df['high'].to_numpy(), df['low'].to_numpy(), df['close'].to_numpy(), window)
+    return pd.Series(values, index=df['close'].index)
+
+
+def calculate_adx_pandas(df, window=14):
+    """
+    The original pandas ADX, kept as the reference for benchmark.py's parity check.
+    ADX measures trend STRENGTH, not direction.
+    ADX > 25 usually implies a strong trend.
+    ADX < 25 usually implies a ranging market.
     """
     data = df.copy()
     data['tr0'] = abs(data['high'] - data['low'])
@@ -48,69 +64,217 @@ def calculate_adx(df, window=14):
     return adx
 
 
-def generate_signal(df,active_features= ['returns', 'range', 'rsi', 'volatility','adx','volume_change', 'relative_volume','dist_from_mean']):
-    # 1. Warm-up Check
-    if len(df) < 50:
-        return "HOLD"
+FEATURE_COLUMNS = ['returns', 'range', 'rsi', 'volatility','adx','volume_change', 'relative_volume','dist_from_mean']
 
-    data = df.copy()
-    
-    # 2. Calculate All Features
-    data['returns'] = data['close'].pct_change()
-    data['range'] = (data['high'] - data['low']) / data['close']
-    data['rsi'] = calculate_rsi(data['close'])
-    data['volatility'] = data['returns'].rolling(window=10).std()
-    data['adx'] = calculate_adx(data)
-   
+# Strategy defaults (param_search.py explores other values)
+ADX_THRESHOLD = 25   # THRESHOLD for "Strong Trend"
+CONFIDENCE = 0.60    # HIGH CONFIDENCE BAR (To beat fees)
+MA_WINDOW = 20       # z-score window for dist_from_mean
+VOLUME_WINDOW = 24   # baseline window for relative_volume
+ADX_WINDOW = 14
+MIN_TRAIN_ROWS = 30  # predict_prob_up needs this many clean rows
+
+
+# --- FEATURE REGISTRY ---
+# Each feature says what it is built from and how many bars it needs to warm up.
+# Registration order is the column order of build_features.
+
+REGISTRY = FeatureRegistry()
+
+
+def _finite(series):
+    # THE "CLEANING" STEP: replace any math errors (inf) with NaN
+    return series.replace([np.inf, -np.inf], np.nan)
+
+
+@REGISTRY.register('returns', inputs=['close'], warmup=1)
+def _returns(data, **params):
+    return _finite(data['close'].pct_change())
+
+
+@REGISTRY.register('range', inputs=['high', 'low', 'close'])
+def _range(data, **params):
+    return _finite((data['high'] - data['low']) / data['close'])
+
+
+@REGISTRY.register('rsi', inputs=['close'], warmup=14)
+def _rsi(data, **params):
+    return _finite(calculate_rsi(data['close']))
+
+
+@REGISTRY.register('volatility', inputs=['returns'], warmup=9)
+def _volatility(data, **params):
+    return data['returns'].rolling(window=10).std()
+
+
+# Shared ADX intermediates (computed once, not returned)
+@REGISTRY.register('true_range', inputs=['high', 'low', 'close'], column=False)
+def _true_range(data, **params):
+    return adx_kernel.true_range(data['high'].to_numpy(dtype=np.float64), data['low'].to_numpy(dtype=np.float64),
+                                 data['close'].to_numpy(dtype=np.float64))
+
+
+@REGISTRY.register('directional_movement', inputs=['high', 'low'], warmup=1, column=False)
+def _directional_movement(data, **params):
+    return adx_kernel.directional_movement(data['high'].to_numpy(dtype=np.float64), data['low'].to_numpy(dtype=np.float64))
+
+
+# Two Wilder smoothings, each one needs about a window to settle
+@REGISTRY.register('adx', inputs=['true_range', 'directional_movement'], warmup=2 * ADX_WINDOW - 1)
+def _adx(data, **params):
+    pdm, ndm = data['directional_movement']
+    values, _, _ = adx_kernel.smooth_adx(data['true_range'], pdm, ndm, ADX_WINDOW)
+    return _finite(pd.Series(values, index=data['close'].index))
+
+
+@REGISTRY.register('close_mean', inputs=['close'], warmup=lambda p: p['ma_window'] - 1, column=False)
+def _close_mean(data, ma_window=MA_WINDOW, **params):
+    return data['close'].rolling(window=ma_window).mean()
+
+
+@REGISTRY.register('close_std', inputs=['close'], warmup=lambda p: p['ma_window'] - 1, column=False)
+def _close_std(data, ma_window=MA_WINDOW, **params):
+    return data['close'].rolling(window=ma_window).std()
+
+
+@REGISTRY.register('dist_from_mean', inputs=['close', 'close_mean', 'close_std'])
+def _dist_from_mean(data, **params):
     # --- 1. DATA-EFFICIENT DIST FROM MEAN ---
     # We use a 20-period window. This is better for 1h charts 
     # and leaves 180 rows of data for the model to learn from.
-    ma_window = 20
-    
     # We do NOT use shift(1) here for the Z-score calculation, 
     # as we want to know the current price's position relative to the current mean.
-    rolling_mean = data['close'].rolling(window=ma_window).mean()
-    rolling_std = data['close'].rolling(window=ma_window).std()
-    
     # Calculate Z-score: (Price - Mean) / StdDev
-    data['dist_from_mean'] = (data['close'] - rolling_mean) / (rolling_std + 1e-9)
+    dist = _finite((data['close'] - data['close_mean']) / (data['close_std'] + 1e-9))
 
-    # --- 3. THE "CLEANING" STEP (Critical) ---
-    # 1. Replace any math errors (inf) with NaN
-    data.replace([np.inf, -np.inf], np.nan, inplace=True)
-    
-    # 2. Fill the very first rows (which are NaN due to shifting) with 0
+    # Fill the very first rows (which are NaN due to shifting) with 0
     # This prevents dropna() from eating your entire 200-row window
-    data['dist_from_mean'] = data['dist_from_mean'].fillna(0)
+    return dist.fillna(0)
 
 
+@REGISTRY.register('volume_change', inputs=['volume'], warmup=1)
+def _volume_change(data, **params):
     # Instead of raw volume, use the percentage change
-    data['volume_change'] = data['volume'].pct_change()
- 
+    return data['volume'].pct_change()
+
+
+@REGISTRY.register('volume_baseline', inputs=['volume'], warmup=lambda p: p['volume_window'], column=False)
+def _volume_baseline(data, volume_window=VOLUME_WINDOW, **params):
     #"Relative Volume" (Current volume vs. 24-hour average)
     #Broken: data['relative_volume'] = data['volume'] / data['volume'].rolling(window=24).mean()
     
-    # 1. Calculate the baseline from the PREVIOUS 24 hours (excluding now)
+    # Calculate the baseline from the PREVIOUS 24 hours (excluding now)
     # We shift by 1 so the average at index 'i' is based on 'i-1' down to 'i-24'
-    baseline_volume = data['volume'].shift(1).rolling(window=24).mean()
+    return data['volume'].shift(1).rolling(window=volume_window).mean()
 
-    # 2. Calculate Relative Volume
+
+@REGISTRY.register('relative_volume', inputs=['volume', 'volume_baseline'])
+def _relative_volume(data, **params):
     # Add a tiny epsilon (1e-9) to the denominator just to prevent "Division by Zero" crashes
-    data['relative_volume'] = data['volume'] / (baseline_volume + 1e-9)
+    relative_volume = data['volume'] / (data['volume_baseline'] + 1e-9)
 
-    # 3. Handle the NaN values created by the shift and rolling window
-    data['relative_volume'] = data['relative_volume'].fillna(0)
-        
-        
-    
+    # Handle the NaN values created by the shift and rolling window
+    return relative_volume.fillna(0)
+
+
+@REGISTRY.register('target', inputs=['close'])
+def _target(data, **params):
     # Target: 1 if next price is higher, else 0
-    data['target'] = (data['close'].shift(-1) > data['close']).astype(int)
-    
+    return (data['close'].shift(-1) > data['close']).astype(int)
+
+
+def signal_features(active_features):
+    """What a signal needs built: the model's features plus the ADX for the regime rules."""
+    return list(dict.fromkeys(list(active_features) + ['adx']))
+
+
+def min_rows(active_features, ma_window=MA_WINDOW, volume_window=VOLUME_WINDOW):
+    """
+    Bars before a signal can be trusted: the warm-up plus the rows the model
+    trains on. The signal paths build (and dropna) EVERY feature, so the
+    slowest feature counts, not only the active ones.
+    """
+    names = list(dict.fromkeys(REGISTRY.columns + signal_features(active_features)))
+    return REGISTRY.warmup(names, ma_window=ma_window, volume_window=volume_window) + MIN_TRAIN_ROWS
+
+
+@metrics.timed("feature_build")
+def build_features(df, ma_window=MA_WINDOW, volume_window=VOLUME_WINDOW, features=None):
+    """
+    Computes the feature columns (plus the 'target') for the whole
+    DataFrame in one vectorized pass.
+    The backtester calls this ONCE and then slices the result per bar,
+    instead of recomputing the indicators on every 50-row window.
+    features=None builds every feature; a list builds only those (and
+    what they depend on). Careful: the signal paths dropna() over every
+    column, so only the full build trains on the same rows as the backtest.
+    """
+    names = REGISTRY.columns if features is None else list(features) + ['target']
+    return REGISTRY.build(df, names, ma_window=ma_window, volume_window=volume_window)
+
+
+def apply_regime_rules(prob_up, current_adx, adx_threshold=ADX_THRESHOLD, confidence=CONFIDENCE, contrarian=True):
+    """
+    Turns the model's P(up) into a signal, depending on the ADX regime.
+    Used per bar by the live bots; backtester.signals_from_probabilities is
+    the vectorized version of the same rules.
+    """
+    if current_adx > adx_threshold or not contrarian:
+        # === TRENDING REGIME (Normal Logic) ===
+        # If trend is strong, TRUST the model direction.
+        if prob_up > confidence:
+            return "BUY"
+        elif prob_up < (1 - confidence):
+            return "SELL"
+    else:
+        # === RANGING REGIME (Contrarian Logic) ===
+        # If trend is weak, FADE the model direction.
+        # This is the "Switch" that gave you the +0.54 Sharpe
+        if prob_up > confidence:
+            return "SELL" # Model screams UP -> We sell top
+        elif prob_up < (1 - confidence):
+            return "BUY"  # Model screams DOWN -> We buy dip
+
+    return "HOLD"
+
+
+def generate_signal(df,active_features= ['returns', 'range', 'rsi', 'volatility','adx','volume_change', 'relative_volume','dist_from_mean'], model_manager=None):
+    # 1. Warm-up Check
+    if len(df) < min_rows(active_features):
+        return "HOLD"
+
+    # 2. Calculate All Features: predict_prob_up drops every row with a NaN in ANY
+    # column, like the backtester and the live bots do, so a lazy build of just
+    # active_features would train on different rows than the backtest
+    data = build_features(df)
+    return generate_signal_from_features(data, active_features, model_manager=model_manager)
+
+
+def generate_signal_from_features(data, active_features= ['returns', 'range', 'rsi', 'volatility','adx','volume_change', 'relative_volume','dist_from_mean'], model_manager=None,
+                                  adx_threshold=ADX_THRESHOLD, confidence=CONFIDENCE):
+    """
+    Same as generate_signal, but takes a window of rows that already went
+    through build_features (e.g. a slice of the precomputed feature matrix).
+    Pass a ModelManager to reuse a cached model between bars instead of
+    fitting a new forest on every call.
+    """
+    prediction = predict_prob_up(data, active_features, model_manager=model_manager)
+    if prediction is None:
+        return "HOLD"
+    prob_up, current_adx = prediction
+    return apply_regime_rules(prob_up, current_adx, adx_threshold, confidence)
+
+
+def predict_prob_up(data, active_features, model_manager=None):
+    """
+    The model half of generate_signal_from_features: trains on the window and
+    returns (prob_up, adx) for its last row, or None when there is no prediction.
+    """
     data = data.dropna()
 
     # Safety: ensure we still have data after dropping NaNs
-    if len(data) < 30:
-        return "HOLD"
+    if len(data) < MIN_TRAIN_ROWS:
+        return None
 
     # 3. Define Features List (Matches your error context)
     #features = ['returns', 'range', 'rsi', 'volatility','adx','volume_change', 'relative_volume','dist_from_mean']
@@ -120,11 +284,17 @@ def generate_signal(df,active_features= ['returns', 'range', 'rsi', 'volatility'
 
     # 4. Train
     # We fit on everything except the last row
-    model = RandomForestClassifier(n_estimators=100, max_depth=5, random_state=42)
-    model.fit(X.iloc[:-1], y.iloc[:-1])
-    
-    if np.random.random() < .1: # Prints roughly every 100 bars
+    if model_manager is None:
+        model = RandomForestClassifier(n_estimators=100, max_depth=5, random_state=42)
+        with metrics.stage("model_fit"):
+            model.fit(X.iloc[:-1], y.iloc[:-1])
         importances = model.feature_importances_
+    else:
+        # Only refits on the manager's cadence (or drift), otherwise reuses the cached model
+        model = model_manager.prepare(X.iloc[:-1], y.iloc[:-1], features)
+        importances = getattr(model.model, 'feature_importances_', None)
+
+    if importances is not None and np.random.random() < .1: # Prints roughly every 100 bars
         print("\n--- 🧠 Model Intelligence Report ---")
         for name, imp in zip(features, importances):
             print(f"{name.upper()}: {imp:.2%}")
@@ -138,53 +308,46 @@ def generate_signal(df,active_features= ['returns', 'range', 'rsi', 'volatility'
         plt.close()
         """
     # 5. Predict
-    latest_features = X.iloc[[-1]]
-    
+    prob_up = _prob_up(model, X.iloc[[-1]])
+    if prob_up is None:
+        return None
+    return prob_up, data['adx'].iloc[-1]
+
+
+def _prob_up(model, latest_features):
     # robust unpacking: we don't assume 2 classes, we just want the probability of "1" (Up)
     try:
         # predict_proba returns a list of probabilities for each class
         # We take [0] to get the first row, and use max() or specific index
-        probs = model.predict_proba(latest_features)[0]
+        with metrics.stage("predict"):
+            probs = model.predict_proba(latest_features)[0]
         
         # If model has 2 classes (0 and 1), probs has length 2.
         # probs[1] is the probability of going UP.
-        prob_up = probs[1] if len(probs) > 1 else 0
+        return probs[1] if len(probs) > 1 else 0
         
     except IndexError:
-        return "HOLD"
-    
-    current_adx = data['adx'].iloc[-1]
-    
-    # THRESHOLD for "Strong Trend"
-    ADX_THRESHOLD = 25 
-    
-    # HIGH CONFIDENCE BAR (To beat fees)
-    CONFIDENCE = 0.60
+        return None
 
-    if current_adx > ADX_THRESHOLD:
-        # === TRENDING REGIME (Normal Logic) ===
-        # If trend is strong, TRUST the model direction.
-        if prob_up > CONFIDENCE:
-            return "BUY"
-        elif prob_up < (1 - CONFIDENCE):
-            return "SELL"
-    else:
-        # === RANGING REGIME (Contrarian Logic) ===
-        # If trend is weak, FADE the model direction.
-        # This is the "Switch" that gave you the +0.54 Sharpe
-        if prob_up > CONFIDENCE:
-            return "SELL" # Model screams UP -> We sell top
-        elif prob_up < (1 - CONFIDENCE):
-            return "BUY"  # Model screams DOWN -> We buy dip
 
-    return "HOLD"
-    # 6. Conviction Logic
-    # Returns a SINGLE string value to match your backtester
+def training_rows(data, active_features):
+    """The labelled rows predict_prob_up would train on: (X, y), or None when the window is too short."""
+    data = data.dropna()
+    if len(data) < MIN_TRAIN_ROWS:
+        return None
+    return data[active_features].iloc[:-1], data['target'].iloc[:-1]
+
+
+def signal_from_model(data, active_features, model_manager, adx_threshold=ADX_THRESHOLD, confidence=CONFIDENCE):
     """
-    if prob_up > 0.6:
-        return "SELL"
-    elif prob_up < 0.4:
-        return "BUY"
-    else:
-        return "HOLD"
+    Predict-only version of generate_signal_from_features: the newest row
+    goes through the model AS IS (no fit). The live bots use it with the
+    model a TrainingWorker fitted in the background.
     """
+    data = data.dropna()
+    if len(data) < MIN_TRAIN_ROWS:
+        return "HOLD"
+    prob_up = _prob_up(model_manager, data[active_features].iloc[[-1]])
+    if prob_up is None:
+        return "HOLD"
+    return apply_regime_rules(prob_up, data['adx'].iloc[-1], adx_threshold, confidence)
@@ -0,0 +1,310 @@
+import asyncio
+import logging
+from abc import ABC, abstractmethod
+import time
+from collections import namedtuple
+
+import ccxt
+import ccxt.pro as ccxt_pro
+import pandas as pd
+
+from bar_store import BarStore
+from config import SYMBOL, TIMEFRAME, API_KEY, SECRET_KEY, STREAM_FEED, STREAM_CLOSE_GRACE
+from async_live_trading import get_async_exchange, run_live_bot_async
+
+# --- EVENTS ---
+
+Trade = namedtuple('Trade', ['ts', 'price', 'amount'])
+# A finished bar of `duration` ms (e.g. 1m bars aggregated into 1h candles)
+Bar = namedtuple('Bar', ['ts', 'open', 'high', 'low', 'close', 'volume', 'duration'])
+
+
+class CandleAggregator:
+    """
+    Builds candles of timeframe_ms out of Trade / Bar events as they arrive.
+    Every add_*() / on_clock() call returns the candles it closed
+    ([ts, open, high, low, close, volume], same rows as CCXT / the BarStore).
+    A candle closes when
+      - a Bar event reaches its end (closes at the true bar close, no waiting),
+      - an event of a later candle arrives, or
+      - on_clock() says the wall clock passed its end (trades feeds).
+    Events for a candle that was already closed are dropped and counted in `late`.
+    """
+    __slots__ = ('timeframe_ms', 'candle', 'closed_until', 'late')
+
+    def __init__(self, timeframe_ms):
+        self.timeframe_ms = timeframe_ms
+        self.candle = None # the forming candle
+        self.closed_until = None # end (ms) of the newest closed candle
+        self.late = 0
+
+    def _close(self):
+        candle, self.candle = self.candle, None
+        self.closed_until = candle[0] + self.timeframe_ms
+        return candle
+
+    def _merge(self, ts, open_, high, low, close, volume):
+        start = ts - ts % self.timeframe_ms
+        closed = []
+        if self.candle is not None:
+            if start > self.candle[0]:
+                closed.append(self._close())
+            elif start < self.candle[0]:
+                self.late += 1
+                return closed
+        if self.closed_until is not None and start < self.closed_until:
+            self.late += 1
+            return closed
+
+        if self.candle is None:
+            self.candle = [start, open_, high, low, close, volume]
+        else:
+            candle = self.candle
+            candle[2] = max(candle[2], high)
+            candle[3] = min(candle[3], low)
+            candle[4] = close
+            candle[5] += volume
+        return closed
+
+    def add_trade(self, ts, price, amount):
+        return self._merge(ts, price, price, price, price, amount)
+
+    def add_bar(self, ts, open_, high, low, close, volume, duration):
+        closed = self._merge(ts, open_, high, low, close, volume)
+        if self.candle is not None and ts + duration >= self.candle[0] + self.timeframe_ms:
+            closed.append(self._close())
+        return closed
+
+    def on_clock(self, now_ms):
+        if self.candle is not None and now_ms >= self.candle[0] + self.timeframe_ms:
+            return [self._close()]
+        return []
+
+
+# --- FEEDS ---
+
+class Feed(ABC):
+    """
+    A market data source. realtime=True means the events follow the wall
+    clock, so BarStream may close a candle on time even if no event comes
+    in after it.
+    """
+    realtime = True
+
+    @abstractmethod
+    def events(self):
+        """An async iterator (async generator) of Trade / Bar events, oldest first."""
+
+    async def close(self):
+        pass
+
+
+class ReplayFeed(Feed):
+    """
+    Offline stand-in for a live feed: replays a candle CSV (e.g. btc_hourly.csv)
+    from row `start` on. By default every row is one Bar event. With
+    as_trades=True every row becomes 4 trades (open, high/low, low/high, close)
+    spread over the candle, to exercise the trade path.
+    speed = seconds to sleep between candles (0 = as fast as possible).
+    """
+    realtime = False
+
+    def __init__(self, path="btc_hourly.csv", timeframe="1h", start=0, speed=0.0, as_trades=False):
+        self.path = path
+        self.duration = ccxt.Exchange.parse_timeframe(timeframe) * 1000
+        self.start = start
+        self.speed = speed
+        self.as_trades = as_trades
+
+    async def events(self):
+        df = pd.read_csv(self.path, parse_dates=['ts']).iloc[self.start:]
+        ts = df['ts'].to_numpy(dtype='datetime64[ms]').astype('int64').tolist()
+        step = self.duration // 4
+        for ts_ms, o, h, l, c, v in zip(ts, *(df[col].tolist() for col in ['open', 'high', 'low', 'close', 'volume'])):
+            if self.as_trades:
+                path = [o, h, l, c] if c >= o else [o, l, h, c]
+                for k, price in enumerate(path):
+                    yield Trade(ts_ms + k * step, price, v / 4)
+            else:
+                yield Bar(ts_ms, o, h, l, c, v, self.duration)
+            await asyncio.sleep(self.speed)
+
+
+class WebSocketTradesFeed(Feed):
+    """Live trades over the exchange's WebSocket (ccxt.pro watch_trades). Reconnects with backoff."""
+    def __init__(self, exchange, symbol, max_backoff=60):
+        self.exchange = exchange
+        self.symbol = symbol
+        self.max_backoff = max_backoff
+
+    async def events(self):
+        backoff = 1
+        while True:
+            try:
+                trades = await self.exchange.watch_trades(self.symbol)
+                backoff = 1
+            except Exception as e:
+                logging.warning(f"⚠️ Trade stream error: {e}. Reconnecting in {backoff}s...")
+                await asyncio.sleep(backoff)
+                backoff = min(backoff * 2, self.max_backoff)
+                continue
+            for trade in trades:
+                yield Trade(trade['timestamp'], trade['price'], trade['amount'])
+
+    async def close(self):
+        await self.exchange.close()
+
+
+class PollingTradesFeed(Feed):
+    """Fallback without WebSockets: polls fetch_trades every poll_interval seconds."""
+    def __init__(self, exchange, symbol, poll_interval=1.0):
+        self.exchange = exchange
+        self.symbol = symbol
+        self.poll_interval = poll_interval
+
+    async def events(self):
+        since = self.exchange.milliseconds()
+        seen = set() # ids at the `since` timestamp, which the next poll returns again
+        while True:
+            try:
+                trades = await self.exchange.fetch_trades(self.symbol, since=since)
+            except Exception as e:
+                logging.warning(f"⚠️ Trade poll error: {e}")
+                trades = []
+            for trade in trades:
+                if trade['id'] in seen or trade['timestamp'] < since:
+                    continue
+                if trade['timestamp'] > since:
+                    since, seen = trade['timestamp'], set()
+                seen.add(trade['id'])
+                yield Trade(trade['timestamp'], trade['price'], trade['amount'])
+            await asyncio.sleep(self.poll_interval)
+
+    async def close(self):
+        await self.exchange.close()
+
+
+def get_stream_exchange():
+    """ccxt.pro client for the WebSocket feed (market data only, no orders)."""
+    return ccxt_pro.alpaca({
+        'apiKey': API_KEY,
+        'secret': SECRET_KEY,
+    })
+
+
+# --- STREAM ---
+
+class BarStream:
+    """
+    Turns a Feed into closed candles the moment they complete.
+    Each closed candle is queued for wait_for_bar(), appended to the
+    BarStore (if given; leave it out when a live bot consumes the stream,
+    the bot stores what it processed) and passed to every on_bar_closed() callback.
+    With a trades feed the candle's volume only counts the trades the
+    feed delivered.
+    max_pending bounds the queue, so a fast replay waits for the bot.
+    """
+    def __init__(self, feed, symbol, timeframe, store=None, grace=STREAM_CLOSE_GRACE, max_pending=None):
+        self.feed = feed
+        self.symbol = symbol
+        self.timeframe = timeframe
+        self.store = store
+        self.grace = grace
+        self.aggregator = CandleAggregator(ccxt.Exchange.parse_timeframe(timeframe) * 1000)
+        self.queue = asyncio.Queue(maxsize=max_pending or 0)
+        self.callbacks = []
+        self.bars_closed = 0
+
+    def on_bar_closed(self, callback):
+        """callback(candle) runs for every closed candle."""
+        self.callbacks.append(callback)
+
+    async def _emit(self, candles):
+        for candle in candles:
+            await self.queue.put(candle)
+            if self.store is not None:
+                self.store.append(self.symbol, self.timeframe, [candle])
+            for callback in self.callbacks:
+                callback(candle)
+            self.bars_closed += 1
+
+    async def _clock(self):
+        """Closes the forming candle `grace` seconds after its end, even if no trade comes in."""
+        timeframe_ms = self.aggregator.timeframe_ms
+        while True:
+            candle = self.aggregator.candle
+            if candle is None:
+                await asyncio.sleep(1)
+                continue
+            await asyncio.sleep(max(0.0, (candle[0] + timeframe_ms) / 1000 + self.grace - time.time()))
+            await self._emit(self.aggregator.on_clock(int((time.time() - self.grace) * 1000)))
+
+    async def run(self):
+        """Consumes the feed until it ends (a replay) or the task is cancelled."""
+        clock = asyncio.create_task(self._clock()) if self.feed.realtime else None
+        try:
+            async for event in self.feed.events():
+                if isinstance(event, Trade):
+                    await self._emit(self.aggregator.add_trade(*event))
+                else:
+                    await self._emit(self.aggregator.add_bar(*event))
+        finally:
+            if clock is not None:
+                clock.cancel()
+            await self.feed.close()
+
+    async def wait_for_bar(self):
+        """The next closed candle. Pass it as run_live_bot_async(wait_for_candle=...)."""
+        return await self.queue.get()
+
+
+async def run_streaming_bot(active_features, symbol=SYMBOL, timeframe=TIMEFRAME, feed=None, store=None, **kwargs):
+    """
+    run_live_bot_async driven by a BarStream instead of the hourly sleep:
+    each decision starts at the true candle close, and any timeframe works.
+    The REST candle fetch only fills the gap on the first cycle; after
+    that the bot appends the streamed candles to the store itself.
+    """
+    store = store or BarStore()
+    if feed is None:
+        feed = WebSocketTradesFeed(get_stream_exchange(), symbol) if STREAM_FEED == 'websocket' \
+            else PollingTradesFeed(get_async_exchange(), symbol)
+    stream = BarStream(feed, symbol, timeframe)
+    streaming = asyncio.create_task(stream.run())
+    try:
+        await run_live_bot_async(active_features, symbol=symbol, timeframe=timeframe, store=store,
+                                 wait_for_candle=stream.wait_for_bar, **kwargs)
+    finally:
+        streaming.cancel()
+
+
+if __name__ == "__main__":
+    # Offline dry run: btc_hourly.csv replayed through the stream into the async bot
+    import tempfile
+    from mock_exchange import MockExchange
+    from model_store import ModelStore
+
+    replay = pd.read_csv("btc_hourly.csv", parse_dates=['ts'])
+    symbol = SYMBOL or "BTC/USD"
+    mock = MockExchange(replay, symbol=symbol)
+
+    async def dry_run(tmp_dir):
+        store = BarStore(tmp_dir)
+        stream = BarStream(ReplayFeed("btc_hourly.csv", start=mock.cursor, as_trades=True), symbol, "1h", max_pending=1)
+        streaming = asyncio.create_task(stream.run())
+
+        async def next_bar():
+            candle = await stream.wait_for_bar()
+            mock.advance() # the mock's prices follow the stream
+            return candle
+
+        try:
+            await run_live_bot_async(["returns", "rsi", "adx", "dist_from_mean"], symbol=symbol, timeframe="1h", exchange=mock,
+                                     store=store, wait_for_candle=next_bar, max_cycles=50,
+                                     model_store=ModelStore(tmp_dir + "/models"))
+        finally:
+            streaming.cancel()
+        print(f"📡 {stream.bars_closed} bars streamed, {stream.aggregator.late} late events dropped")
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        asyncio.run(dry_run(tmp_dir))
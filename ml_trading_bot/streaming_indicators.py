@@ -0,0 +1,303 @@
+from collections import deque
+import math
+
+import numpy as np
+import pandas as pd
+
+from trading_state import BarRingBuffer
+
+
+def _div(a, b):
+    """Division with numpy semantics (x/0 -> inf, 0/0 -> nan) instead of ZeroDivisionError."""
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return float(np.float64(a) / np.float64(b))
+
+
+def _pct_change(current, previous):
+    if previous is None:
+        return math.nan
+    return _div(current - previous, previous)
+
+
+class WilderEMA:
+    """
+    Running equivalent of series.ewm(alpha=alpha, adjust=False).mean().
+    Reproduces pandas' NaN handling too (ignore_na=False), so the values
+    match the batch version bit-for-bit up to float rounding.
+    """
+    __slots__ = ('alpha', 'value', 'old_wt')
+
+    def __init__(self, alpha):
+        self.alpha = alpha
+        self.value = math.nan
+        self.old_wt = 1.0
+
+    def update(self, x):
+        is_obs = not math.isnan(x)
+        if not math.isnan(self.value):
+            self.old_wt *= (1 - self.alpha)
+            if is_obs:
+                self.value = (self.old_wt * self.value + self.alpha * x) / (self.old_wt + self.alpha)
+                self.old_wt = 1.0
+        elif is_obs:
+            self.value = x
+        return self.value
+
+
+class RollingStats:
+    """
+    Sliding-window mean / sample std (ddof=1) with O(1) updates (Welford).
+    Like pandas rolling(window), the result is NaN until the window is full
+    and while any NaN is inside it.
+    The running sums are rebuilt from the window every `window` updates so
+    float error can't pile up over weeks of uptime. A window of one repeated
+    value (a flat market) gives that value / 0 exactly, like pandas, instead
+    of the rounding residue of the values that just left the window.
+    """
+    __slots__ = ('window', 'values', 'nan_count', 'n', 'mean_', 'm2', 'updates', 'last', 'same_count')
+
+    def __init__(self, window):
+        self.window = window
+        self.values = deque(maxlen=window)
+        self.nan_count = 0
+        self.n = 0
+        self.mean_ = 0.0
+        self.m2 = 0.0
+        self.updates = 0
+        self.last = math.nan
+        self.same_count = 0 # how many times in a row `last` came in
+
+    def _add(self, x):
+        self.n += 1
+        delta = x - self.mean_
+        self.mean_ += delta / self.n
+        self.m2 += delta * (x - self.mean_)
+
+    def _remove(self, x):
+        self.n -= 1
+        if self.n == 0:
+            self.mean_, self.m2 = 0.0, 0.0
+            return
+        delta = x - self.mean_
+        self.mean_ -= delta / self.n
+        self.m2 -= delta * (x - self.mean_)
+
+    def _rebuild(self):
+        finite = [v for v in self.values if not math.isnan(v)]
+        self.n = len(finite)
+        self.mean_ = sum(finite) / self.n if finite else 0.0
+        self.m2 = sum((v - self.mean_) ** 2 for v in finite)
+
+    def update(self, x):
+        if len(self.values) == self.window:
+            old = self.values[0]
+            if math.isnan(old):
+                self.nan_count -= 1
+            else:
+                self._remove(old)
+        self.values.append(x)
+        if math.isnan(x):
+            self.nan_count += 1
+        else:
+            self._add(x)
+
+        if x == self.last:
+            self.same_count += 1
+        else:
+            self.last, self.same_count = x, 1
+
+        self.updates += 1
+        if self.updates % self.window == 0:
+            self._rebuild()
+
+    @property
+    def ready(self):
+        return len(self.values) == self.window and self.nan_count == 0
+
+    @property
+    def mean(self):
+        if not self.ready:
+            return math.nan
+        return self.last if self.same_count >= self.window else self.mean_
+
+    @property
+    def std(self):
+        if not self.ready or self.n < 2:
+            return math.nan
+        if self.same_count >= self.window:
+            return 0.0
+        return math.sqrt(max(self.m2, 0.0) / (self.n - 1))
+
+
+class StreamingRSI:
+    """Running version of strategy.calculate_rsi (simple rolling mean of gains / losses)."""
+    __slots__ = ('prev_close', 'gains', 'losses', 'value')
+
+    def __init__(self, window=14):
+        self.prev_close = None
+        self.gains = RollingStats(window)
+        self.losses = RollingStats(window)
+        self.value = math.nan
+
+    def update(self, close):
+        if self.prev_close is None:
+            # First delta is NaN -> counts as 0 gain / 0 loss (same as delta.where(...))
+            gain, loss = 0.0, 0.0
+        else:
+            delta = close - self.prev_close
+            gain, loss = max(delta, 0.0), max(-delta, 0.0)
+        self.prev_close = close
+
+        self.gains.update(gain)
+        self.losses.update(loss)
+        rs = _div(self.gains.mean, self.losses.mean)
+        self.value = 100 - _div(100, 1 + rs)
+        return self.value
+
+
+class StreamingADX:
+    """
+    Running version of strategy.calculate_adx.
+    Keeps the Wilder-smoothed TR, +DM, -DM and DX, so each candle is O(1).
+    """
+    __slots__ = ('tr_smooth', 'pdm_smooth', 'ndm_smooth', 'adx_smooth', 'prev', 'value')
+
+    def __init__(self, window=14):
+        alpha = 1 / window
+        self.tr_smooth = WilderEMA(alpha)
+        self.pdm_smooth = WilderEMA(alpha)
+        self.ndm_smooth = WilderEMA(alpha)
+        self.adx_smooth = WilderEMA(alpha)
+        self.prev = None # (high, low, close) of the previous candle
+        self.value = math.nan
+
+    def update(self, high, low, close):
+        if self.prev is None:
+            tr = abs(high - low)
+            pdm, ndm = 0.0, 0.0
+        else:
+            prev_high, prev_low, prev_close = self.prev
+            tr = max(abs(high - low), abs(high - prev_close), abs(low - prev_close))
+            up_move = high - prev_high
+            down_move = prev_low - low
+            pdm = max(up_move, 0.0) if up_move > down_move else 0.0
+            ndm = max(down_move, 0.0) if down_move > up_move else 0.0
+        self.prev = (high, low, close)
+
+        tr_s = self.tr_smooth.update(tr)
+        pdi = 100 * _div(self.pdm_smooth.update(pdm), tr_s)
+        ndi = 100 * _div(self.ndm_smooth.update(ndm), tr_s)
+        dx = 100 * _div(abs(pdi - ndi), pdi + ndi)
+        self.value = self.adx_smooth.update(dx)
+        return self.value
+
+
+def _clean(x):
+    return math.nan if math.isinf(x) else x
+
+
+class StreamingFeatures:
+    """
+    Running version of strategy.build_features.
+    update() takes ONE candle and returns that candle's feature row
+    (same columns and cleaning rules as the batch function).
+    """
+    __slots__ = ('rsi', 'adx', 'volatility', 'price_stats', 'volume_baseline', 'prev_close', 'prev_volume')
+
+    def __init__(self, ma_window=20, volume_window=24):
+        self.rsi = StreamingRSI()
+        self.adx = StreamingADX()
+        self.volatility = RollingStats(10)
+        self.price_stats = RollingStats(ma_window)
+        self.volume_baseline = RollingStats(volume_window)
+        self.prev_close = None
+        self.prev_volume = None
+
+    def update(self, ts, open_, high, low, close, volume):
+        returns = _pct_change(close, self.prev_close)
+        self.volatility.update(returns)
+        self.price_stats.update(close)
+
+        dist_from_mean = _clean(_div(close - self.price_stats.mean, self.price_stats.std + 1e-9))
+
+        # Baseline = the PREVIOUS volume_window candles, so read it before adding this one
+        relative_volume = _div(volume, self.volume_baseline.mean + 1e-9)
+        self.volume_baseline.update(volume)
+
+        row = {
+            'ts': ts, 'open': open_, 'high': high, 'low': low, 'close': close, 'volume': volume,
+            'returns': _clean(returns),
+            'range': _clean(_div(high - low, close)),
+            'rsi': _clean(self.rsi.update(close)),
+            'volatility': _clean(self.volatility.std),
+            'adx': _clean(self.adx.update(high, low, close)),
+            'dist_from_mean': 0.0 if math.isnan(dist_from_mean) else dist_from_mean,
+            'volume_change': _pct_change(volume, self.prev_volume),
+            'relative_volume': 0.0 if math.isnan(relative_volume) else relative_volume,
+        }
+        self.prev_close = close
+        self.prev_volume = volume
+        return row
+
+
+# Every column of a FeatureWindow row except 'ts', in build_features order
+WINDOW_COLUMNS = ['open', 'high', 'low', 'close', 'volume', 'returns', 'range', 'rsi',
+                  'volatility', 'adx', 'dist_from_mean', 'volume_change', 'relative_volume']
+
+
+class FeatureWindow:
+    """
+    The last `maxlen` feature rows, updated one candle at a time.
+    The rows live in a BarRingBuffer (fixed NumPy arrays), so a long-running
+    bot allocates nothing per candle except the frame it hands to the model.
+    to_frame() gives the same layout as build_features (incl. 'target'),
+    ready for generate_signal_from_features.
+    """
+    def __init__(self, maxlen=300):
+        self.features = StreamingFeatures()
+        self.rows = BarRingBuffer(WINDOW_COLUMNS, maxlen)
+
+    @property
+    def last_ts(self):
+        """The newest candle we saw (pd.Timestamp), or None."""
+        last_ts = self.rows.last_ts
+        return None if last_ts is None else pd.Timestamp(last_ts, unit='ms')
+
+    def update(self, ts, open_, high, low, close, volume):
+        """One candle; ts in ms. A candle that isn't newer than the last one is ignored (returns False)."""
+        if self.rows.last_ts is not None and ts <= self.rows.last_ts:
+            return False
+        self.rows.append(ts, self.features.update(ts, open_, high, low, close, volume))
+        return True
+
+    def update_from_arrays(self, ts, open_, high, low, close, volume):
+        """Feeds every candle newer than the last one we saw (ts as int64 ms). Returns how many."""
+        if self.rows.last_ts is not None:
+            first = int(np.searchsorted(ts, self.rows.last_ts, side='right'))
+        else:
+            first = 0
+        for i in range(first, len(ts)):
+            self.update(int(ts[i]), float(open_[i]), float(high[i]), float(low[i]), float(close[i]), float(volume[i]))
+        return len(ts) - first
+
+    def update_from_frame(self, df):
+        """Feeds every candle in df that is newer than the last one we saw."""
+        return self.update_from_arrays(df['ts'].to_numpy(dtype='datetime64[ms]').astype(np.int64),
+                                       *(df[c].to_numpy(dtype=np.float64) for c in ['open', 'high', 'low', 'close', 'volume']))
+
+    def update_from_store(self, store, symbol, timeframe):
+        """
+        Reads only the candles after the last one we saw straight from the
+        BarStore (the first call warms up on the newest maxlen candles).
+        """
+        last_ts = self.rows.last_ts
+        if last_ts is None:
+            bars = store.read_arrays(symbol, timeframe, last_n=self.rows.maxlen)
+        else:
+            bars = store.read_arrays(symbol, timeframe, start=pd.Timestamp(last_ts + 1, unit='ms'))
+        return self.update_from_arrays(bars['ts'], bars['open'], bars['high'], bars['low'], bars['close'], bars['volume'])
+
+    def to_frame(self):
+        data = self.rows.to_frame()
+        data['target'] = (data['close'].shift(-1) > data['close']).astype(int)
+        return data
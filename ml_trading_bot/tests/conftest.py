@@ -0,0 +1,38 @@
+import os
+import sys
+
+import numpy as np
+import pytest
+
+# The bot's modules are flat files next to this folder (run from ml_trading_bot/)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmark import make_synthetic_ohlcv
+
+
+@pytest.fixture
+def ohlcv():
+    """A fixed synthetic series (same seed every run)."""
+    return make_synthetic_ohlcv(3000, seed=7)
+
+
+@pytest.fixture
+def ohlcv_with_gaps(ohlcv):
+    """The same series with NaN prices and a flat stretch (no range, no movement)."""
+    df = ohlcv.copy()
+    df.loc[400:430, ['open', 'high', 'low', 'close']] = 50000.0
+    df.loc[1000, 'high'] = np.nan
+    df.loc[1500:1505, 'low'] = np.nan
+    df.loc[2200:2202, ['high', 'low', 'close']] = np.nan
+    return df
+
+
+def assert_close(expected, actual, tol=1e-9):
+    """Same NaN pattern, and every finite value within tol (relative, absolute below 1)."""
+    expected = np.asarray(expected, dtype=np.float64)
+    actual = np.asarray(actual, dtype=np.float64)
+    assert expected.shape == actual.shape
+    np.testing.assert_array_equal(np.isnan(expected), np.isnan(actual))
+    mask = np.isfinite(expected)
+    err = np.abs(expected[mask] - actual[mask]) / np.maximum(1.0, np.abs(expected[mask]))
+    assert err.max(initial=0.0) <= tol
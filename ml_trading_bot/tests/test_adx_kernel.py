@@ -0,0 +1,66 @@
+import numpy as np
+import pytest
+
+import adx_kernel
+from conftest import assert_close
+from strategy import calculate_adx, calculate_adx_pandas
+from streaming_indicators import StreamingADX
+
+
+def _arrays(df):
+    return tuple(df[c].to_numpy(dtype=np.float64) for c in ('high', 'low', 'close'))
+
+
+def _chunked(df, chunk):
+    high, low, close = _arrays(df)
+    values, state = [], None
+    for start in range(0, len(df), chunk):
+        part, state = adx_kernel.adx(high[start:start + chunk], low[start:start + chunk],
+                                     close[start:start + chunk], state=state)
+        values.append(part)
+    return np.concatenate(values)
+
+
+@pytest.mark.parametrize('series', ['ohlcv', 'ohlcv_with_gaps'])
+def test_batch_matches_pandas(series, request):
+    df = request.getfixturevalue(series)
+    expected = calculate_adx_pandas(df)
+    assert_close(expected, adx_kernel.adx(*_arrays(df))[0])
+    assert_close(expected, calculate_adx(df))
+
+
+@pytest.mark.parametrize('series', ['ohlcv', 'ohlcv_with_gaps'])
+@pytest.mark.parametrize('chunk', [1, 7, 97, 1000])
+def test_chunked_matches_pandas(series, chunk, request):
+    df = request.getfixturevalue(series)
+    assert_close(calculate_adx_pandas(df), _chunked(df, chunk))
+
+
+@pytest.mark.parametrize('series', ['ohlcv', 'ohlcv_with_gaps'])
+def test_streaming_matches_pandas(series, request):
+    df = request.getfixturevalue(series)
+    streaming_adx = StreamingADX()
+    stream = [streaming_adx.update(h, l, c) for h, l, c in zip(*_arrays(df))]
+    assert_close(calculate_adx_pandas(df), stream)
+
+
+def test_other_window(ohlcv):
+    assert_close(calculate_adx_pandas(ohlcv, window=5), adx_kernel.adx(*_arrays(ohlcv), window=5)[0])
+
+
+def test_wilder_smooth_matches_ewm(ohlcv_with_gaps):
+    x = ohlcv_with_gaps['high'].to_numpy(dtype=np.float64, copy=True)
+    x[:3] = np.nan # leading NaNs
+    expected = ohlcv_with_gaps['high'].where(np.arange(len(x)) >= 3).ewm(alpha=0.1, adjust=False).mean()
+    assert_close(expected, adx_kernel.wilder_smooth(x, 0.1)[0])
+
+    # Continuing from the state of the first half gives the same as one pass
+    first, value, old_wt = adx_kernel.wilder_smooth(x[:1003], 0.1)
+    second, _, _ = adx_kernel.wilder_smooth(x[1003:], 0.1, value, old_wt)
+    assert_close(expected, np.concatenate([first, second]))
+
+
+def test_empty_input_keeps_state(ohlcv):
+    _, state = adx_kernel.adx(*_arrays(ohlcv.iloc[:50]))
+    values, same = adx_kernel.adx(np.empty(0), np.empty(0), np.empty(0), state=state)
+    assert len(values) == 0 and same is state
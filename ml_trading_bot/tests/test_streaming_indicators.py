@@ -0,0 +1,51 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from conftest import assert_close
+from strategy import build_features, calculate_rsi, FEATURE_COLUMNS
+from streaming_indicators import FeatureWindow, RollingStats, StreamingFeatures, StreamingRSI
+
+
+@pytest.mark.parametrize('window', [2, 10, 24])
+def test_rolling_stats_match_pandas(ohlcv, window):
+    values = ohlcv['close'].pct_change().to_numpy(copy=True)
+    values[[500, 501, 900]] = np.nan # NaN gaps inside the window
+    stats = RollingStats(window)
+    means, stds = [], []
+    for x in values:
+        stats.update(x)
+        means.append(stats.mean)
+        stds.append(stats.std)
+    series = pd.Series(values)
+    assert_close(series.rolling(window).mean(), means)
+    assert_close(series.rolling(window).std(), stds)
+
+
+@pytest.mark.parametrize('series', ['ohlcv', 'ohlcv_with_gaps'])
+def test_rsi_matches_pandas(series, request):
+    # The gaps series has a flat stretch, where the RSI divides 0 by 0
+    close = request.getfixturevalue(series)['close'].ffill()
+    rsi = StreamingRSI()
+    assert_close(calculate_rsi(close), [rsi.update(c) for c in close])
+
+
+def test_streaming_features_match_build_features(ohlcv):
+    batch = build_features(ohlcv)
+    engine = StreamingFeatures()
+    stream = pd.DataFrame([engine.update(b.ts, b.open, b.high, b.low, b.close, b.volume)
+                           for b in ohlcv.itertuples(index=False)])
+    for column in FEATURE_COLUMNS:
+        assert_close(batch[column], stream[column])
+
+
+def test_feature_window_matches_build_features(ohlcv):
+    window = FeatureWindow(maxlen=300)
+    window.update_from_frame(ohlcv)
+    frame = window.to_frame()
+    batch = build_features(ohlcv).iloc[-300:].reset_index(drop=True)
+    for column in FEATURE_COLUMNS:
+        assert_close(batch[column], frame[column])
+    # An old candle is ignored
+    first = ohlcv.iloc[0]
+    assert not window.update(int(first.ts.value // 1_000_000), first.open, first.high, first.low, first.close, first.volume)
@@ -0,0 +1,93 @@
+import numpy as np
+import pandas as pd
+
+
+class BarRingBuffer:
+    """
+    The newest `maxlen` bars in fixed-size NumPy arrays, one row per bar.
+    append() writes over the oldest row in place, so the memory is allocated
+    ONCE and stays flat no matter how many weeks the bot runs.
+    Timestamps are int64 ms, like the BarStore.
+    """
+    __slots__ = ('columns', 'maxlen', 'ts', 'values', '_next', '_size')
+
+    def __init__(self, columns, maxlen=300):
+        self.columns = list(columns)
+        self.maxlen = maxlen
+        self.ts = np.zeros(maxlen, dtype=np.int64)
+        self.values = np.full((maxlen, len(self.columns)), np.nan)
+        self._next = 0 # slot the next bar goes into
+        self._size = 0
+
+    def __len__(self):
+        return self._size
+
+    def append(self, ts, row):
+        """row: a dict with every column, or the values in column order."""
+        slot = self._next
+        self.ts[slot] = ts
+        values = self.values[slot]
+        if isinstance(row, dict):
+            for i, column in enumerate(self.columns):
+                values[i] = row[column]
+        else:
+            values[:] = row
+        self._next = (slot + 1) % self.maxlen
+        self._size = min(self._size + 1, self.maxlen)
+
+    @property
+    def last_ts(self):
+        """Timestamp (ms) of the newest bar, or None while empty."""
+        return int(self.ts[self._next - 1]) if self._size else None
+
+    def arrays(self):
+        """(ts, values) oldest bar first. These are copies, safe to hand to another thread."""
+        if self._size < self.maxlen:
+            return self.ts[:self._size].copy(), self.values[:self._size].copy()
+        split = self._next
+        return (np.concatenate((self.ts[split:], self.ts[:split])),
+                np.concatenate((self.values[split:], self.values[:split])))
+
+    def to_frame(self):
+        ts, values = self.arrays()
+        data = pd.DataFrame(values, columns=self.columns)
+        data.insert(0, 'ts', pd.to_datetime(ts, unit='ms'))
+        return data
+
+
+class PositionState:
+    """
+    The n-signal confirmation buffer shared by the backtester and the live bots.
+    A new position needs `confirmations` signals in a row that disagree with
+    the current one; a signal that agrees resets the count, and 4 HOLDs in a
+    row reset it too. Works with the backtester's int codes and with the
+    live bots' "BUY"/"SELL"/"HOLD" strings (pass the matching `hold` value).
+    """
+    __slots__ = ('position', 'hold', 'confirmations', 'switch_counter', 'hold_counter')
+
+    def __init__(self, position, hold, confirmations=3):
+        self.position = position
+        self.hold = hold
+        self.confirmations = confirmations
+        self.switch_counter = 0
+        self.hold_counter = 0
+
+    def update(self, signal):
+        """Feeds one raw signal. Returns True when it confirms a switch (self.position is already the new one)."""
+        if signal != self.hold:
+            self.hold_counter = 0
+            if signal != self.position:
+                self.switch_counter += 1
+            else:
+                self.switch_counter = 0
+        else:
+            self.hold_counter += 1
+            if self.hold_counter == 4:
+                self.switch_counter = 0
+
+        if self.switch_counter == self.confirmations:
+            self.position = signal
+            self.switch_counter = 0
+            self.hold_counter = 0
+            return True
+        return False
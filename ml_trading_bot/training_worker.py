@@ -0,0 +1,80 @@
+import copy
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+
+class TrainingWorker:
+    """
+    Moves model training off the candle-close path.
+
+    After each decision the live loop submit()s the labelled rows it just
+    saw. When that changes the model (prepare(): refit on its cadence / drift,
+    or the online partial_fit), a background thread updates a COPY of the
+    current ModelManager while the loop sleeps until the next candle, and
+    swaps it in atomically. Other bars only advance the bar count.
+    At candle close the loop only predicts the newest row with `model_manager`.
+    The trade-off: the decision at bar t uses a model trained on the rows
+    up to t-1.
+
+    With a ModelStore, every refit model is saved from the background thread too.
+    """
+    def __init__(self, model_manager, model_store=None, store_key=None):
+        self._model_manager = model_manager
+        self._lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="training")
+        self._future = None
+        self.model_store = model_store
+        self.store_key = store_key # (symbol, timeframe, window) for ModelStore.save
+        self.skipped = 0
+
+    @property
+    def model_manager(self):
+        """The newest finished model (never one that is still being trained)."""
+        with self._lock:
+            return self._model_manager
+
+    def ready(self):
+        return self.model_manager.model is not None
+
+    def busy(self):
+        return self._future is not None and not self._future.done()
+
+    def _train(self, X, y, features):
+        try:
+            current = self.model_manager
+            if not current.update_due(X, features):
+                # Only the bar count changes, no need to copy the forest
+                current.bars_since_fit += 1
+                return
+            candidate = copy.deepcopy(current)
+            fits_before = candidate.fit_count
+            candidate.prepare(X, y, features)
+            # Atomic swap: readers see either the old model or the new one
+            with self._lock:
+                self._model_manager = candidate
+            if self.model_store is not None and candidate.fit_count != fits_before:
+                self.model_store.save(candidate, *self.store_key)
+        except Exception as e:
+            logging.error(f"❌ Background training failed: {e}")
+
+    def train_now(self, X, y, features):
+        """Synchronous update, for the very first model when there was nothing to warm-start from."""
+        self._train(X, y, features)
+
+    def submit(self, X, y, features):
+        """Queues a background update. Skipped if the previous one is still running."""
+        if self.busy():
+            self.skipped += 1
+            logging.warning("⚠️ Previous training still running, skipping this update.")
+            return False
+        self._future = self._pool.submit(self._train, X.copy(), y.copy(), list(features))
+        return True
+
+    def wait(self, timeout=None):
+        """Blocks until the running update (if any) is done."""
+        if self._future is not None:
+            self._future.result(timeout=timeout)
+
+    def close(self):
+        self._pool.shutdown(wait=True)
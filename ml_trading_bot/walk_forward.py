@@ -0,0 +1,141 @@
+import csv
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from backtester import signals_from_probabilities, simulate, plot_results
+from config import (RETRAIN_EVERY, DRIFT_THRESHOLD, ONLINE_LEARNING,
+                    WALK_FORWARD_TRAIN, WALK_FORWARD_TEST, WALK_FORWARD_STEP, WALK_FORWARD_ANCHORED)
+from model_manager import ModelManager
+from performance_metrics import generate_report
+from strategy import build_features, MIN_TRAIN_ROWS
+
+
+def make_folds(n_rows, train_size, test_size, step=None, anchored=False):
+    """
+    Rolling-origin folds as (train_start, test_start, test_end) row indices.
+    Every fold trains on [train_start, test_start) and trades [test_start, test_end).
+    The origin moves forward by `step` bars (default: test_size, so the test
+    windows line up back to back). anchored=True keeps train_start at 0
+    (expanding window) instead of sliding it.
+    Like run_backtest, the very last bar is never tested.
+    """
+    step = step or test_size
+    folds = []
+    test_start = train_size
+    while test_start < n_rows - 1:
+        test_end = min(test_start + test_size, n_rows - 1)
+        train_start = 0 if anchored else test_start - train_size
+        folds.append((train_start, test_start, test_end))
+        test_start += step
+    return folds
+
+
+def _run_fold(window, train_len, active_features, initial_balance, model_params):
+    """
+    Worker: one fold. `window` holds the fold's feature rows, train rows first,
+    then the test rows, then the bar after them (simulate stops one bar
+    before the end of its input, like run_backtest).
+    The model is fit ONCE, predicts every test bar in one predict_proba call,
+    and the rules are applied to all of them at once. Like generate_probabilities,
+    test bar j is predicted from row j-1's features (so the model trains on the
+    rows before train_len-1, whose targets are known by then).
+    Each fold starts flat with initial_balance.
+    """
+    active_features = list(active_features)
+    test_len = len(window) - train_len - 1
+    train = window.iloc[:train_len - 1].dropna()
+    # Row j-1 -> the signal for test bar j
+    rows = window.iloc[train_len - 1:train_len - 1 + test_len]
+
+    # Codes for bar train_len-1 (the mark-to-market base) .. the extra bar; HOLD = 0
+    signals = np.zeros(test_len + 2, dtype=np.int8)
+    if len(train) >= MIN_TRAIN_ROWS and train['target'].nunique() > 1:
+        model_manager = ModelManager(**model_params)
+        model_manager.fit(train[active_features], train['target'], active_features)
+
+        valid = rows[active_features].notna().all(axis=1).to_numpy()
+        if valid.any():
+            classes = list(model_manager.model.classes_)
+            probs = model_manager.predict_proba(rows.loc[valid, active_features])
+            prob_up = np.full(test_len, np.nan)
+            prob_up[valid] = probs[:, classes.index(1)]
+            signals[1:test_len + 1] = signals_from_probabilities(
+                prob_up, rows['adx'].to_numpy(dtype=np.float64), np.zeros(test_len, dtype=bool))
+
+    close = window['close'].to_numpy(dtype=np.float64)[train_len - 1:]
+    equity, switches = simulate(close, signals, 1, initial_balance)
+    return equity, len(switches)
+
+
+def run_walk_forward(df, active_features=['returns', 'rsi', 'adx', 'dist_from_mean'], train_size=WALK_FORWARD_TRAIN,
+                     test_size=WALK_FORWARD_TEST, step=WALK_FORWARD_STEP, anchored=WALK_FORWARD_ANCHORED,
+                     initial_balance=10000, workers=None, log_file="walk_forward_results.csv"):
+    """
+    Walk-forward evaluation over the WHOLE history instead of the single
+    80/20 split in run_backtest. The folds are independent, so they run in
+    parallel worker processes. The fold returns are chained into one equity
+    curve (when folds overlap, each one only contributes the bars up to the
+    next fold's start), and the per-fold reports are written to log_file.
+    """
+    folds = make_folds(len(df), train_size, test_size, step, anchored)
+    if not folds:
+        print(f"Error: Not enough data for walk-forward. Need more than {train_size + 1} rows.")
+        return None
+
+    print(f"🚶 Walk-forward on {len(df)} rows: {len(folds)} folds "
+          f"(train {train_size}{' anchored' if anchored else ''}, test {test_size}, step {step or test_size})")
+
+    # 1. Features ONCE, then each worker only gets its own slice
+    features = build_features(df)
+    model_params = dict(retrain_every=RETRAIN_EVERY, drift_threshold=DRIFT_THRESHOLD, online=ONLINE_LEARNING)
+    windows = [features.iloc[train_start:test_end + 1] for train_start, test_start, test_end in folds]
+    train_lens = [test_start - train_start for train_start, test_start, test_end in folds]
+
+    # 2. Folds in parallel (results come back in fold order)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        results = list(pool.map(_run_fold, windows, train_lens, [active_features] * len(folds),
+                                [initial_balance] * len(folds), [model_params] * len(folds)))
+
+    # 3. Chain the folds into one curve + one report row per fold
+    ts = pd.to_datetime(features['ts']).to_numpy()
+    curve_dates = [ts[folds[0][1] - 1]]
+    curve_values = [float(initial_balance)]
+    rows = []
+    for n, ((train_start, test_start, test_end), (equity, n_switches)) in enumerate(zip(folds, results), start=1):
+        # equity[k] is the balance at the close of bar test_start - 1 + k
+        fold_series = pd.Series(equity, index=pd.to_datetime(ts[test_start - 1:test_end]))
+        report = generate_report(fold_series)
+        rows.append([n, ts[train_start], ts[test_start - 1], ts[test_start], ts[test_end - 1], n_switches,
+                     report["Sharpe Ratio"], report["Max Drawdown"], report["Total Return"]])
+
+        keep = test_end - test_start
+        if n < len(folds):
+            keep = min(keep, folds[n][1] - test_start)
+        growth = equity[1:keep + 1] / equity[0]
+        curve_values.extend(curve_values[-1] * growth)
+        curve_dates.extend(ts[test_start:test_start + keep])
+
+    equity_series = pd.Series(curve_values, index=pd.to_datetime(curve_dates))
+
+    with open(log_file, mode='w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['Fold', 'Train_Start', 'Train_End', 'Test_Start', 'Test_End', 'Switches',
+                         'Sharpe_Ratio', 'max Drawdown', 'Total_Return_Pct'])
+        writer.writerows(rows)
+
+    print("\n--- Walk-Forward Folds ---")
+    for row in rows:
+        print(f"Fold {row[0]:>3} | {pd.Timestamp(row[3])} -> {pd.Timestamp(row[4])} | "
+              f"{row[5]:>3} switches | Sharpe {row[6]} | MDD {row[7]} | Return {row[8]}")
+
+    report = generate_report(equity_series)
+    print("\n--- Walk-Forward Performance Report ---")
+    for k, v in report.items():
+        print(f"{k}: {v}")
+    print("------------------------------------------")
+    print(f"📄 Per-fold results in {log_file}")
+
+    plot_results(equity_series, ["walk_forward"] + list(active_features))
+    return report